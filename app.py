@@ -3,123 +3,850 @@
 #----------------------------------------------------------------------------#
 
 import json
+import os
 import sys
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+import click
+from jinja2 import FileSystemBytecodeCache
+try:
+  # Optional, considerably faster JSON encoder for the API
+  import orjson
+except ImportError:
+  orjson = None
+from flask import Flask, Blueprint, render_template, request, Response, flash, redirect, url_for, abort, jsonify, stream_with_context, g, current_app
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.ext.associationproxy import association_proxy
 import logging
 from flask_migrate import Migrate
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-# Obtaining models drom separate file
-#from models import *
+from cache import PageCache
+from autocomplete import NameIndex
+from matchmaking import MatchIndex
+from assets import Assets, build_assets
+from instrumentation import RequestMetrics, TimedQueuePool
+from models import db, read_only, Artist, Venue, Show, ShowCounterState, SimilarArtist
+
+# babel, dateutil, the forms (with their long choice lists) and the loader are
+# imported where they are used, so the command line tools and the startup of a
+# worker only pay for them when needed (warm_up() loads them ahead of a fork)
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
+# Extensions are bound to the app by create_app() (see Application factory below)
+moment = Moment()
 
-# Obtain local database configuration from config.py
-app.config.from_object('config')
+# Prepare migrations
+migrate = Migrate()
 
-db = SQLAlchemy(app)
-db.init_app(app)
+# Record query count, database and template time of every request
+request_metrics = RequestMetrics()
 
-# Prepare migrations
-migrate = Migrate(app, db)
+# Fingerprinted static files, asset_url() in the templates (see assets.py)
+static_assets = Assets()
+
+# Routes and commands of the site, the JSON API has its own blueprint below
+main = Blueprint('main', __name__, cli_group=None)
 
 #----------------------------------------------------------------------------#
-# Models.
+# Page cache.
 #----------------------------------------------------------------------------#
 
-# Define Artists class as the parent class for joining with Venue class
-
-class Artist(db.Model):
-    __tablename__ = 'artists'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean())
-    seeking_description = db.Column(db.String(500))
-    
-    # Realize the many-to-many relation via association proxy
-    show = association_proxy("shows", "venues")
+# Rendered list pages are cached until a commit touches the models they show
+page_cache = PageCache()
+page_cache.invalidate_on(Venue, 'venues', 'shows', 'names', 'matches')
+page_cache.invalidate_on(Artist, 'artists', 'shows', 'names', 'matches')
+page_cache.invalidate_on(Show, 'venues', 'shows')
 
-    def __repr__(self):
-        return f'<Artist id: {self.id}, Artist name: {self.name}>'
+@main.before_app_request
+def route_reads_after_writes():
+  # A page read from a lagging replica right after a write would be cached
+  # (and an in-memory index rebuilt from it) until the next write, read
+  # from the primary for REPLICA_MAX_LAG seconds after any write instead
+  if 'replica' in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+    g.recent_write = page_cache.written_within(current_app.config.get('REPLICA_MAX_LAG', 5))
 
-  # Define Venue class
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
 
-class Venue(db.Model):
-    __tablename__ = 'venues'
+# Venue and artist names for search-as-you-type, kept in memory (see autocomplete.py)
+name_index = NameIndex('names')
+name_index.index_model(Venue, 'venue')
+name_index.index_model(Artist, 'artist')
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean())
-    seeking_description = db.Column(db.String(500))
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#----------------------------------------------------------------------------#
 
-    # Realize the many-to-many relation via association proxy
-    artist = association_proxy("shows", "artist")
+# Genres, cities and seeking flags of venues and artists, kept in memory to
+# suggest venues to an artist and artists to a venue (see matchmaking.py)
+match_index = MatchIndex('matches')
+match_index.index_model(Venue, 'venue')
+match_index.index_model(Artist, 'artist')
 
-    def __repr__(self):
-        return f'<Venue id: {self.id}, Venue name: {self.name}>'
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
 
-# Define Shows table as the association tableobject for Artist and Venue class (many-to-many relation)
+# Named formats accepted by the datetime filter, any other value is used as a Babel pattern
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+# Number of distinct (timestamp, format, locale) results kept in memory
+DATETIME_FORMAT_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=None)
+def compiled_datetime_pattern(format, locale):
+  # Parse the Babel pattern and the locale only once per (format, locale)
+  import babel.dates
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=DATETIME_FORMAT_CACHE_SIZE)
+def format_datetime_cached(date, format, locale):
+  # Shows share start times a lot (same evening, same slot), so results are memoized
+  pattern, babel_locale = compiled_datetime_pattern(format, locale)
+  return pattern.apply(date, babel_locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # Takes datetime objects directly, strings from older templates are still parsed
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  return format_datetime_cached(value, DATETIME_FORMATS.get(format, format), locale)
+
+def preload_templates(app):
+  # Load (and compile, or read from the bytecode cache) every template once,
+  # so the first requests of a worker do not pay for it
+  names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
 
-class Show(db.Model):
-    __tablename__ = 'shows'
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
 
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
-    start_time = db.Column(db.DateTime())
+# venues and artists carry upcoming_shows_count / past_shows_count. A show
+# counts as upcoming when it starts after ShowCounterState.rolled_at: new shows
+# are counted in the transaction that inserts them, and the periodic
+# 'flask counters roll' job moves the shows that started since the last run
+# from upcoming to past. 'flask counters rebuild' recomputes everything.
+
+ROLL_SHOW_COUNTERS = """
+    UPDATE {table} SET upcoming_shows_count = {table}.upcoming_shows_count - moved.count,
+                       past_shows_count = {table}.past_shows_count + moved.count
+    FROM (SELECT {column}, count(*) AS count FROM shows
+          WHERE start_time > :rolled_at AND start_time <= :now
+          GROUP BY {column}) AS moved
+    WHERE {table}.id = moved.{column}
+"""
+
+REBUILD_SHOW_COUNTERS = """
+    UPDATE {table} SET upcoming_shows_count = coalesce(counted.upcoming, 0),
+                       past_shows_count = coalesce(counted.past, 0)
+    FROM {table} AS entity
+    LEFT JOIN (SELECT {column},
+                      count(*) FILTER (WHERE start_time > :now) AS upcoming,
+                      count(*) FILTER (WHERE start_time <= :now) AS past
+               FROM shows GROUP BY {column}) AS counted ON counted.{column} = entity.id
+    WHERE {table}.id = entity.id
+"""
+
+COUNTED_TABLES = (('venues', 'venue_id'), ('artists', 'artist_id'))
+
+def show_counter_state(lock=False, read=False):
+  # The state row, locked so that rolling and counting new shows serialize
+  query = ShowCounterState.query
+  if lock:
+    query = query.with_for_update(read=read)
+  state = query.first()
+  if state is None:
+    state = ShowCounterState(id=1, rolled_at=datetime.now())
+    db.session.add(state)
+  return state
+
+def count_new_show(show):
+  # Count a new show on its venue and artist, in the caller's transaction
+  rolled_at = show_counter_state(lock=True, read=True).rolled_at
+  column = 'upcoming_shows_count' if show.start_time > rolled_at else 'past_shows_count'
+  for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    model.query.filter_by(id=entity_id) \
+      .update({column: getattr(model, column) + 1}, synchronize_session=False)
+
+def roll_show_counters():
+  # Move the shows that started since the last run from upcoming to past
+  state = show_counter_state(lock=True)
+  now = datetime.now()
+  for table, column in COUNTED_TABLES:
+    db.session.execute(ROLL_SHOW_COUNTERS.format(table=table, column=column),
+                       {'rolled_at': state.rolled_at, 'now': now})
+  state.rolled_at = now
+  db.session.commit()
+  page_cache.invalidate('venues', 'shows')
+  return now
+
+def rebuild_show_counters():
+  # Recompute all counters from the shows table
+  state = show_counter_state(lock=True)
+  now = datetime.now()
+  for table, column in COUNTED_TABLES:
+    db.session.execute(REBUILD_SHOW_COUNTERS.format(table=table, column=column), {'now': now})
+  state.rolled_at = now
+  db.session.commit()
+  page_cache.invalidate('venues', 'shows')
+  return now
 
-    artist = db.relationship(Artist, backref="shows")
-    venue = db.relationship(Venue, backref="shows")
+#----------------------------------------------------------------------------#
+# Analytics rollups.
+#----------------------------------------------------------------------------#
 
-    def __repr__(self):
-        return f'<Show id: {self.id}, Artist id: {self.artist_id}, Venue id: {self.venue_id}, Show starttime: {self.start_time}>'
+# show_daily_rollups and show_monthly_rollups count the shows per day / month
+# of every venue, artist, city and genre (see models.py), so the analytics
+# pages read a few hundred pre-aggregated rows instead of the shows. A show is
+# counted under the city of its venue and the genres of its artist. New shows
+# are added in the transaction that inserts them, deleted shows are taken off
+# by the bulk delete and editing the city of a venue or the genres of an
+# artist moves its shows to the new keys. 'flask analytics rebuild'
+# recomputes everything (also run by 'flask load shows').
+
+# {shows} selects (day, venue_id, artist_id) of the shows to add (sign 1) or
+# take off (sign -1). Both upserts run in key order, so concurrent writers lock
+# the shared rollup rows in the same order and cannot deadlock.
+ROLL_UP_SHOWS = """
+    WITH counted AS (
+        SELECT played.day, played.venue_id, played.artist_id, artists.genres,
+               coalesce(venues.city, '') || ', ' || coalesce(venues.state, '') AS city
+        FROM ({shows}) AS played
+        JOIN venues ON venues.id = played.venue_id
+        JOIN artists ON artists.id = played.artist_id
+    ), keyed AS (
+        SELECT keys.dimension, keys.key, counted.day, counted.genres
+        FROM counted CROSS JOIN LATERAL (VALUES ('venue', counted.venue_id::text),
+                                                ('artist', counted.artist_id::text),
+                                                ('city', counted.city)) AS keys (dimension, key)
+        UNION ALL
+        SELECT 'genre', genre, counted.day, '{{}}'::varchar[]
+        FROM counted CROSS JOIN LATERAL unnest(counted.genres) AS genre
+    ), daily AS (
+        INSERT INTO show_daily_rollups (dimension, key, day, shows)
+        SELECT dimension, key, day, :sign * count(*) FROM keyed
+        GROUP BY dimension, key, day ORDER BY dimension, key, day
+        ON CONFLICT (dimension, key, day) DO UPDATE SET shows = show_daily_rollups.shows + excluded.shows
+    )
+    INSERT INTO show_monthly_rollups (dimension, key, month, genre, shows)
+    SELECT keyed.dimension, keyed.key, date_trunc('month', keyed.day)::date AS month, mix.genre, :sign * count(*)
+    FROM keyed CROSS JOIN LATERAL (SELECT '' UNION ALL SELECT unnest(keyed.genres)) AS mix (genre)
+    GROUP BY keyed.dimension, keyed.key, month, mix.genre ORDER BY keyed.dimension, keyed.key, month, mix.genre
+    ON CONFLICT (dimension, key, month, genre) DO UPDATE SET shows = show_monthly_rollups.shows + excluded.shows
+"""
+
+NEW_SHOW = 'SELECT CAST(:day AS date) AS day, CAST(:venue_id AS integer) AS venue_id, CAST(:artist_id AS integer) AS artist_id'
+
+STORED_SHOWS = 'SELECT start_time::date AS day, venue_id, artist_id FROM shows WHERE {condition}'
+
+def roll_up_new_show(show):
+  # Count a new show in the rollups, in the caller's transaction
+  db.session.execute(ROLL_UP_SHOWS.format(shows=NEW_SHOW), {
+      'day': show.start_time.date(), 'venue_id': show.venue_id, 'artist_id': show.artist_id, 'sign': 1})
+
+def roll_stored_shows(column, ids, sign):
+  # Add (sign 1) or take off (sign -1) the shows of the venues (column
+  # 'venue_id') or artists with the given ids, under the city and genres
+  # currently stored for them, in the caller's transaction
+  db.session.execute(ROLL_UP_SHOWS.format(shows=STORED_SHOWS.format(condition=column + ' = ANY(:ids)')),
+                     {'ids': ids, 'sign': sign})
+
+@contextmanager
+def rekeyed_rollups(column, entity_id, changed=True):
+  # Move the shows of one venue (column 'venue_id') or artist to new rollup
+  # keys around an edit of its city / state or genres: counted down under the
+  # stored values before the edit, counted up under the new ones after it.
+  # Does nothing when changed is false.
+  #
+  #   with rekeyed_rollups('venue_id', venue.id, changed=venue.city != city):
+  #     venue.city = city
+  if not changed:
+    yield
+    return
+  roll_stored_shows(column, [entity_id], -1)
+  yield
+  db.session.flush()
+  roll_stored_shows(column, [entity_id], 1)
+
+def rebuild_show_rollups():
+  # Recompute all rollups from the shows table, dropping the rows counted down to zero
+  db.session.execute('DELETE FROM show_daily_rollups')
+  db.session.execute('DELETE FROM show_monthly_rollups')
+  db.session.execute(ROLL_UP_SHOWS.format(shows=STORED_SHOWS.format(condition='TRUE')), {'sign': 1})
+  db.session.commit()
+  page_cache.invalidate('shows')
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Bulk delete.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+# Deletes many venues (or artists) in one statement. The database removes
+# their shows through ON DELETE CASCADE (see migration 5c1d8e2a9b47), the
+# same statement first takes those shows off the counters of the artists (or
+# venues) they were played with, using the same upcoming / past split as the
+# counters themselves (see Show counters above). The analytics rollups are
+# counted down just before, in the same transaction.
+
+DELETE_LISTINGS = """
+    WITH removed AS (
+        SELECT {other_column} AS id,
+               count(*) FILTER (WHERE start_time > :rolled_at) AS upcoming,
+               count(*) FILTER (WHERE start_time <= :rolled_at) AS past
+        FROM shows WHERE {column} = ANY(:ids) GROUP BY {other_column}
+    ), uncounted AS (
+        UPDATE {other_table} SET upcoming_shows_count = {other_table}.upcoming_shows_count - removed.upcoming,
+                                 past_shows_count = {other_table}.past_shows_count - removed.past
+        FROM removed WHERE {other_table}.id = removed.id
+    )
+    DELETE FROM {table} WHERE id = ANY(:ids) RETURNING id
+"""
+
+def delete_listings(model, ids):
+  # Delete the venues or artists with the given ids and all their shows in
+  # one transaction, returns the ids actually deleted
+  ids = sorted({int(entity_id) for entity_id in ids})
+  if not ids:
+    return []
+
+  (table, column), (other_table, other_column) = COUNTED_TABLES if model is Venue else reversed(COUNTED_TABLES)
+  rolled_at = show_counter_state(lock=True, read=True).rolled_at
+  roll_stored_shows(column, ids, -1)
+  deleted = db.session.execute(
+      DELETE_LISTINGS.format(table=table, column=column, other_table=other_table, other_column=other_column),
+      {'ids': ids, 'rolled_at': rolled_at}).fetchall()
+  db.session.commit()
+
+  # The statement bypasses the ORM session, so the cached pages and the in-memory indexes are updated by hand
+  deleted = [row[0] for row in deleted]
+  page_cache.invalidate('venues', 'artists', 'shows', 'names', 'matches')
+  name_index.remove('venue' if model is Venue else 'artist', deleted)
+  match_index.remove('venue' if model is Venue else 'artist', deleted)
+  return deleted
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# The HTML views and the JSON API share these functions, they return plain
+# dictionaries and lists ready to be rendered or serialized
+
+def run_concurrently(*calls):
+  # Run independent query functions at the same time and return their results
+  # in order. The first call runs on the calling request's own session, every
+  # other call gets its own app context and therefore its own session and
+  # connection, the replica routing and the request metrics of the calling
+  # request are carried over. The extra connections of the whole process are
+  # capped at CONCURRENT_QUERY_WORKERS: a call finding none free runs here
+  # after the first one, so a busy worker falls back to running the queries
+  # one after another instead of exhausting the connection pool.
+  if not current_app.config.get('CONCURRENT_QUERIES') or len(calls) < 2:
+    return [call() for call in calls]
+
+  app = current_app._get_current_object()
+  slots = app.extensions['query_slots']
+  shared = {name: g.get(name) for name in ('read_only', 'recent_write', 'request_metrics') if g.get(name) is not None}
+
+  def run(call):
+    try:
+      with app.app_context():
+        for name, value in shared.items():
+          setattr(g, name, value)
+        try:
+          return call()
+        finally:
+          db.session.remove()
+    finally:
+      slots.release()
+
+  futures = [app.extensions['query_executor'].submit(run, call) if slots.acquire(blocking=False) else None
+             for call in calls[1:]]
+  results = [calls[0]()]
+  for future, call in zip(futures, calls[1:]):
+    results.append(future.result() if future is not None else call())
+  return results
+
+def venue_areas(genre=None):
+  # All venues grouped by city / state with their upcoming show count
+  return list(iter_venue_areas(genre))
+
+def iter_venue_areas(genre=None):
+  # Yield the city / state areas of venue_areas() one at a time. The venues
+  # are read through a server-side cursor, STREAM_BATCH_SIZE rows at a time,
+  # so the API can stream the whole listing without holding it in memory.
+
+  # Get all venues together with their maintained upcoming show counter in one query
+  venue_rows = db.session.query(
+      Venue.city,
+      Venue.state,
+      Venue.id,
+      Venue.name,
+      Venue.upcoming_shows_count.label('num_upcoming_shows')
+  )
+
+  # Optionally restrict to one genre, answered by the GIN index on genres
+  if genre:
+      venue_rows = venue_rows.filter(Venue.genres.contains([genre]))
+
+  venue_rows = venue_rows.order_by(Venue.state, Venue.city, Venue.name) \
+      .yield_per(current_app.config.get('STREAM_BATCH_SIZE', 1000))
+
+  # Assemble the city / state areas in a single pass, the ordering above
+  # guarantees that venues of the same area are consecutive
+  city_state_entry = None
+
+  for venue_row in venue_rows:
+      if city_state_entry is None or \
+         (city_state_entry["city"], city_state_entry["state"]) != (venue_row.city, venue_row.state):
+          if city_state_entry is not None:
+              yield city_state_entry
+          city_state_entry = {
+              "city": venue_row.city,
+              "state": venue_row.state,
+              "venues": []
+          }
+
+      # Create the venue data part
+      city_state_entry["venues"].append({
+          "id": venue_row.id,
+          "name": venue_row.name,
+          "num_upcoming_shows": venue_row.num_upcoming_shows
+          })
+
+  if city_state_entry is not None:
+      yield city_state_entry
+
+def artist_listing(genre=None):
+  # All artists (id and name) sorted by name
+  return list(iter_artist_listing(genre))
+
+def iter_artist_listing(genre=None):
+  # Yield the artists of artist_listing() one at a time, read through a
+  # server-side cursor like iter_venue_areas()
+
+  # Get all artists from the list (sorted by artist name)
+  artist_list = db.session.query(Artist.id, Artist.name)
+
+  # Optionally restrict to one genre, answered by the GIN index on genres
+  if genre:
+      artist_list = artist_list.filter(Artist.genres.contains([genre]))
+
+  artist_list = artist_list.order_by(Artist.name) \
+      .yield_per(current_app.config.get('STREAM_BATCH_SIZE', 1000))
+
+  for artist_item in artist_list:
+      yield {"id": artist_item.id, "name": artist_item.name}
+
+def show_listing(when='upcoming', after=''):
+  # One page of shows, keyset paginated on (start_time, id).
+  # when='upcoming' lists upcoming shows soonest first, when='past' lists
+  # past shows most recent first, after='<start_time>_<id>' continues after
+  # the last show of the previous page. Returns (shows, next cursor or None).
+
+  # Initialize the current time, the page size and the data dictionary to be passed back  
+  time_now = datetime.now()
+  per_page = current_app.config.get('SHOWS_PER_PAGE', 30)
+  data = []
+
+  # Project only the columns needed by the template, joining venue and artist in the same statement
+  show_query = db.session.query(
+      Show.id,
+      Show.start_time,
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id) \
+   .join(Artist, Artist.id == Show.artist_id)
+
+  # Decode the cursor, an invalid cursor simply starts from the first page
+  cursor = None
+  try:
+      cursor_time, cursor_id = (after or '').rsplit('_', 1)
+      import dateutil.parser
+      cursor = (dateutil.parser.parse(cursor_time), int(cursor_id))
+  except (ValueError, OverflowError):
+      pass
+
+  if when == 'upcoming':
+      show_query = show_query.filter(Show.start_time > time_now)
+      if cursor:
+          show_query = show_query.filter(db.tuple_(Show.start_time, Show.id) > cursor)
+      show_query = show_query.order_by(Show.start_time, Show.id)
+  else:
+      show_query = show_query.filter(Show.start_time <= time_now)
+      if cursor:
+          show_query = show_query.filter(db.tuple_(Show.start_time, Show.id) < cursor)
+      show_query = show_query.order_by(Show.start_time.desc(), Show.id.desc())
+
+  # Fetch one extra row to know whether there is a next page
+  show_list = show_query.limit(per_page + 1).all()
+  next_cursor = None
+  if len(show_list) > per_page:
+      show_list = show_list[:per_page]
+      next_cursor = show_list[-1].start_time.isoformat() + '_' + str(show_list[-1].id)
+
+  # Prepare the show entries by looping through show list
+  for show_item in show_list:
+      data.append({
+          "venue_id": show_item.venue_id,
+          "venue_name": show_item.venue_name,
+          "artist_id": show_item.artist_id,
+          "artist_name": show_item.artist_name,
+          "artist_image_link": show_item.artist_image_link,
+          "start_time": show_item.start_time
+      })
+
+  return data, next_cursor
+
+# Columns shown on the venue and artist detail pages
+
+VENUE_DETAIL_FIELDS = ['id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+                       'facebook_link', 'seeking_talent', 'seeking_description', 'image_link']
+
+ARTIST_DETAIL_FIELDS = ['id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                        'facebook_link', 'seeking_venue', 'seeking_description', 'image_link']
+
+def venue_detail(venue_id, past_page=1):
+  # The venue with its upcoming and past shows, None for an unknown venue
+  return entity_detail(Venue, VENUE_DETAIL_FIELDS, venue_id, Show.venue_id, Artist, "artist", past_page=past_page)
+
+def artist_detail(artist_id, past_page=1):
+  # The artist with its upcoming and past shows and similar artists, None for an unknown artist
+  data = entity_detail(Artist, ARTIST_DETAIL_FIELDS, artist_id, Show.artist_id, Venue, "venue", past_page=past_page)
+  if data is not None:
+    data["similar_artists"] = similar_artists(artist_id)
+  return data
+
+def similar_artists(artist_id, limit=None):
+  # Artists playing the same venues, precomputed by 'flask recommendations
+  # rebuild' (see similarity.py): one range scan of the similar_artists
+  # primary key, already in rank order
+  if limit is None:
+    limit = current_app.config.get('SIMILAR_ARTISTS', 6)
+
+  rows = db.session.query(
+      Artist.id,
+      Artist.name,
+      Artist.image_link,
+      SimilarArtist.shared_venues
+  ).join(SimilarArtist, SimilarArtist.similar_artist_id == Artist.id) \
+   .filter(SimilarArtist.artist_id == artist_id) \
+   .order_by(SimilarArtist.rank) \
+   .limit(limit) \
+   .all()
+
+  return [{"artist_id": row[0], "artist_name": row[1], "artist_image_link": row[2], "shared_venues": row[3]}
+          for row in rows]
+
+def search_by_name(model, search_term, page=1, per_page=None):
+  # Relevance ranked, paginated name search for artists and venues.
+  # Matching uses the trigram (ilike) and full-text (tsvector) indexes from
+  # migration 9b2f6c1d7a34, the total number of hits is computed in the same
+  # statement. Returns (total, list of dicts).
+  if per_page is None:
+    per_page = current_app.config.get('SEARCH_RESULTS_PER_PAGE', 20)
+  page = max(int(page), 1)
+
+  name_vector = db.func.to_tsvector('simple', db.func.coalesce(model.name, ''))
+  name_query = db.func.plainto_tsquery('simple', search_term)
+  # % and _ in the term match themselves, not any characters
+  name_pattern = '%' + search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+  rows = db.session.query(
+      model.id,
+      model.name,
+      model.upcoming_shows_count.label('num_upcoming_shows'),
+      db.func.count().over().label('total')
+  ).filter(db.or_(model.name.ilike(name_pattern, escape='\\'), name_vector.op('@@')(name_query))) \
+   .order_by(db.func.similarity(model.name, search_term).desc(),
+             db.func.ts_rank(name_vector, name_query).desc(),
+             model.name) \
+   .limit(per_page) \
+   .offset((page - 1) * per_page) \
+   .all()
+
+  total = rows[0].total if rows else 0
+  hits = [{"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows} for row in rows]
+
+  return total, hits
+
+def show_period(start_time, end_time):
+  # [start_time, end_time) as a Postgres tsrange, the shape of the exclusion constraint on shows
+  return db.func.tsrange(start_time, end_time)
+
+def naive_local(value):
+  # Show times are stored without a time zone in the server's local time, the
+  # clock datetime.now() reads for the upcoming / past split and the counters.
+  # Input with an offset ('2035-04-01T21:00Z', '...+02:00') is converted to it.
+  if value.tzinfo is not None:
+    value = value.astimezone().replace(tzinfo=None)
+  return value
+
+def parse_time_window(starts, ends):
+  # (start, end) naive datetimes of a requested time window, the end defaults
+  # to one show duration after the start. Raises ValueError for invalid input.
+  import dateutil.parser
+  if not starts:
+    raise ValueError('start is required')
+  try:
+    window_start = naive_local(dateutil.parser.parse(starts))
+    if ends:
+      window_end = naive_local(dateutil.parser.parse(ends))
+    else:
+      window_end = window_start + timedelta(minutes=current_app.config.get('SHOW_DEFAULT_DURATION', 180))
+  except OverflowError:
+    raise ValueError('invalid date')
+  if window_end <= window_start:
+    raise ValueError('end must be after start')
+  return window_start, window_end
+
+def venue_availability(window_start, window_end, city='', state='', genre='', limit=None):
+  # Venues without any show overlapping [window_start, window_end), optionally
+  # in one city / state and genre, sorted by name. Every candidate venue is
+  # checked with a single probe of the GiST index behind the exclusion
+  # constraint on shows, the city / state and genre filters use their own indexes.
+  if limit is None:
+    limit = current_app.config.get('AVAILABILITY_RESULTS', 50)
+
+  booked = db.session.query(Show.id) \
+    .filter(Show.venue_id == Venue.id) \
+    .filter(show_period(Show.start_time, Show.end_time).op('&&')(show_period(window_start, window_end))) \
+    .exists()
+
+  venue_rows = db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.genres,
+      Venue.seeking_talent
+  ).filter(~booked)
+
+  if city:
+      venue_rows = venue_rows.filter(Venue.city == city)
+  if state:
+      venue_rows = venue_rows.filter(Venue.state == state)
+  if genre:
+      venue_rows = venue_rows.filter(Venue.genres.contains([genre]))
+
+  venue_rows = venue_rows.order_by(Venue.name, Venue.id).limit(limit).all()
+
+  return [{
+      "id": venue_row.id,
+      "name": venue_row.name,
+      "city": venue_row.city,
+      "state": venue_row.state,
+      "genres": venue_row.genres,
+      "seeking_talent": venue_row.seeking_talent
+  } for venue_row in venue_rows]
+
+def calendar_window(view='month', day=''):
+  # (view, first day, day after the last day) of the month or week (starting
+  # Monday) containing day, today for a missing or invalid day
+  import dateutil.parser
+  try:
+    day = dateutil.parser.parse(day).date() if day else date.today()
+  except (ValueError, OverflowError):
+    day = date.today()
+  if view == 'week':
+    first_day = day - timedelta(days=day.weekday())
+    return 'week', first_day, first_day + timedelta(days=7)
+  first_day = day.replace(day=1)
+  return 'month', first_day, (first_day + timedelta(days=32)).replace(day=1)
+
+def show_calendar(first_day, end_day, city=''):
+  # The shows starting in [first_day, end_day), optionally only at venues of
+  # one city, grouped by day. A single statement range scans the
+  # (start_time, id) index, joins venue and artist names and builds the list
+  # of shows per day in SQL, so its cost depends on the shows in the window,
+  # not on the whole history. Returns [{"day": date, "shows": [...]}] by day.
+  show_day = db.cast(Show.start_time, db.Date)
+  show_entry = db.func.json_build_object(
+      'id', Show.id,
+      'start_time', Show.start_time,
+      'end_time', Show.end_time,
+      'venue_id', Venue.id,
+      'venue_name', Venue.name,
+      'artist_id', Artist.id,
+      'artist_name', Artist.name
+  )
+
+  day_rows = db.session.query(
+      show_day.label('day'),
+      db.func.json_agg(aggregate_order_by(show_entry, Show.start_time, Show.id)).label('shows')
+  ).join(Venue, Venue.id == Show.venue_id) \
+   .join(Artist, Artist.id == Show.artist_id) \
+   .filter(Show.start_time >= first_day, Show.start_time < end_day)
+
+  if city:
+      day_rows = day_rows.filter(Venue.city == city)
+
+  day_rows = day_rows.group_by(show_day).order_by(show_day).all()
+
+  return [{"day": day_row.day, "shows": day_row.shows} for day_row in day_rows]
+
+# Rollup dimensions, with the table naming the venues and artists by id
+ANALYTICS_DIMENSIONS = {'venue': 'venues', 'artist': 'artists', 'city': None, 'genre': None}
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SHOW_ANALYTICS = """
+    SELECT {name} AS name,
+      (SELECT json_agg(json_build_object('month', month, 'shows', shows) ORDER BY month)
+       FROM show_monthly_rollups
+       WHERE dimension = :dimension AND key = :key AND genre = '' AND month >= :since AND shows > 0) AS months,
+      (SELECT json_agg(json_build_object('weekday', weekday, 'shows', shows) ORDER BY weekday)
+       FROM (SELECT extract(isodow FROM day)::int AS weekday, sum(shows)::int AS shows
+             FROM show_daily_rollups
+             WHERE dimension = :dimension AND key = :key AND day >= :since
+             GROUP BY 1) AS weekdays) AS weekdays,
+      (SELECT json_agg(json_build_object('genre', genre, 'shows', shows) ORDER BY shows DESC, genre)
+       FROM (SELECT genre, sum(shows)::int AS shows
+             FROM show_monthly_rollups
+             WHERE dimension = :dimension AND key = :key AND genre <> '' AND month >= :since
+             GROUP BY genre HAVING sum(shows) > 0) AS genres) AS genres
+"""
+
+def show_analytics(dimension, key, months=None):
+  # Shows per month, per weekday and by genre of one venue, artist, city
+  # ('City, ST') or genre from the first day of the month months - 1 months
+  # ago on (booked upcoming shows included). One statement reading the primary
+  # key ranges of the rollups (see Analytics rollups above), at most a few
+  # hundred rows. None for an unknown dimension, venue or artist.
+  if dimension not in ANALYTICS_DIMENSIONS:
+    return None
+  if months is None:
+    months = current_app.config.get('ANALYTICS_MONTHS', 12)
+  months = min(max(int(months), 1), 120)
+
+  params = {'dimension': dimension, 'key': key}
+  if ANALYTICS_DIMENSIONS[dimension]:
+    if not key.isdigit():
+      return None
+    name = '(SELECT name FROM {0} WHERE id = :entity_id)'.format(ANALYTICS_DIMENSIONS[dimension])
+    params['entity_id'] = int(key)
+    # The rollups store ids as plain numbers ('7', not '007')
+    params['key'] = str(params['entity_id'])
+  else:
+    name = 'CAST(:key AS varchar)'
+
+  today = date.today()
+  first_month = today.year * 12 + today.month - months
+  params['since'] = date(first_month // 12, first_month % 12 + 1, 1)
+
+  row = db.session.execute(SHOW_ANALYTICS.format(name=name), params).first()
+  if row.name is None:
+    return None
+
+  shows_per_weekday = {entry['weekday']: entry['shows'] for entry in row.weekdays or []}
+  return {
+      "dimension": dimension,
+      "key": key,
+      "name": row.name,
+      "since": params['since'],
+      "months": row.months or [],
+      "weekdays": [{"weekday": weekday, "shows": shows_per_weekday.get(number, 0)}
+                   for number, weekday in enumerate(WEEKDAYS, 1)],
+      "genres": row.genres or [],
+      "total": sum(entry['shows'] for entry in row.months or [])
+  }
+
+def entity_detail(model, fields, entity_id, show_column, counterpart, prefix, past_page=1, per_page=None):
+  # Collect one venue (or artist) with its upcoming and past shows in a fixed
+  # number of independent queries: the entity row, both show counts, the
+  # upcoming shows and the requested page of past shows. The counterpart (the
+  # artist of a venue show and vice versa) is joined in the same statement,
+  # the past / upcoming split and the ordering happen in SQL. With
+  # CONCURRENT_QUERIES enabled the four queries can run at the same time.
+  if per_page is None:
+    per_page = current_app.config.get('PAST_SHOWS_PER_PAGE', 30)
+  past_page = max(int(past_page), 1)
+  time_now = datetime.now()
+
+  counterpart_id = Show.venue_id if counterpart is Venue else Show.artist_id
+
+  def load_entity():
+    row = db.session.query(*[getattr(model, field) for field in fields]) \
+        .filter(model.id == entity_id) \
+        .first()
+    return dict(zip(fields, row)) if row else None
+
+  def load_counts():
+    return db.session.query(
+        db.func.count(Show.id).filter(Show.start_time > time_now),
+        db.func.count(Show.id).filter(Show.start_time <= time_now)
+    ).filter(show_column == entity_id).one()
+
+  def show_query():
+    return db.session.query(
+        counterpart.id,
+        counterpart.name,
+        counterpart.image_link,
+        Show.start_time
+    ).join(counterpart, counterpart.id == counterpart_id) \
+     .filter(show_column == entity_id)
+
+  def load_upcoming():
+    return show_query().filter(Show.start_time > time_now) \
+        .order_by(Show.start_time, Show.id) \
+        .all()
+
+  def load_past():
+    # Past shows are listed most recent first and can be paged for busy venues
+    return show_query().filter(Show.start_time <= time_now) \
+        .order_by(Show.start_time.desc(), Show.id.desc()) \
+        .limit(per_page) \
+        .offset((past_page - 1) * per_page) \
+        .all()
+
+  data, (upcoming_shows_count, past_shows_count), upcoming_shows, past_shows = \
+    run_concurrently(load_entity, load_counts, load_upcoming, load_past)
+
+  if data is None:
+    return None
+
+  def show_entry(row):
+    return {
+        prefix + "_id": row[0],
+        prefix + "_name": row[1],
+        prefix + "_image_link": row[2],
+        # Passed as datetime, the templates format it with the datetime filter
+        "start_time": row[3]
+    }
+
+  # Append the show-related data to data
+  data.update({
+      "upcoming_shows": [show_entry(row) for row in upcoming_shows],
+      "upcoming_shows_count": upcoming_shows_count,
+      "past_shows": [show_entry(row) for row in past_shows],
+      "past_shows_count": past_shows_count,
+      "past_page": past_page,
+      "past_has_next": past_page * per_page < past_shows_count
+  })
 
-app.jinja_env.filters['datetime'] = format_datetime
+  return data
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -127,189 +854,149 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@page_cache.cached('venues')
+@read_only
 def venues():
 
-  # Initialize the current time and the data dictionary to be passed back  
-  time_now = datetime.now()
-  data = []
-
-  # Get the venues according to city and state
-  venue_list = Venue.query.distinct(Venue.city, Venue.state).all()
-
-  # Prepare the city / state part of the entry by looping through venue list
-  for venue_item in venue_list:
-      city_state_entry = {
-          "city": venue_item.city,
-          "state": venue_item.state
-      }
-
-      # For the specifiy city / state combination, add the id / name / show parts 
-      venues = Venue.query.filter_by(city=venue_item.city, state=venue_item.state).all()
-
-      # Format the dictionary entry by the initializing the format string, looping through each entry of matching venue
-      # and adding to dictionary entry
-      venues_part = []
-
-      for venue in venues:
-          # Create a list of the shows in the specific venue
-          venue_shows = Show.query.filter_by(venue_id=venue.id).all()
-          upcoming_show_count = 0
-
-          # Loop through shows and check whether start time is in the future    
-          for show in venue_shows:
-              if show.start_time > time_now:
-                  upcoming_show_count += 1
-
-          # Create the venue data part
-          venues_part.append({
-              "id": venue.id,
-              "name": venue.name,
-              "num_upcoming_shows": upcoming_show_count
-              })
-        
-      city_state_entry["venues"] = venues_part
-
-      # Append the completed entry 
-      data.append(city_state_entry)
+  # Get the venues grouped by city / state, optionally restricted to one genre (?genre=Jazz)
+  data = venue_areas(genre=request.args.get('genre', '').strip())
 
   return render_template('pages/venues.html', areas=data);
 
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
-  # search for venues, case-insensitive
+  # search for venues, case-insensitive and ranked by relevance
 
-    # Get the search string from the search form request
+    # Get the search string and the requested result page from the search form request
     search_term = request.form.get('search_term', '').strip()
+    page = request.form.get('page', 1, type=int)
+
+    # Get the matching venues together with their upcoming show count in one statement
+    count, search_result = search_by_name(Venue, search_term, page=page)
 
- # Initialize the current time and the search result to be passed back  
-    time_now = datetime.now() 
-    count = 0
-    search_result = []
-
-    # Get the matching venues from the list by using alike for case insensitive search + wildcard characters around it
-    venues_search_list = Venue.query.filter(Venue.name.ilike('%'+search_term+'%')).all()
-
-    # Loop through the list of venues to produce the proper entries
-    for venue in venues_search_list:
-        # Count entries and prepare the artist entries which can be directly obtained
-        count +=1
-        search_entry = {
-            "id": venue.id,
-            "name": venue.name
-        }
-
-        #Initialize future show count
-        upcoming_show_count = 0
-
-        # Create a list of the shows for the specific venue
-        venue_shows = Show.query.filter_by(venue_id=venue.id).all()
-          
-        # Loop through shows and check whether start time is in the future    
-        for show in venue_shows:
-            if show.start_time > time_now:
-                upcoming_show_count += 1
-        
-        search_entry["num_upcoming_shows"] = upcoming_show_count
-
-        # Append the show-related data to search result
-        search_result.append(search_entry)
-        
     # Create the response entry
     response = {
         "count": count,
-        "data": search_result
+        "data": search_result,
+        "page": page,
+        "has_next": page * current_app.config.get('SEARCH_RESULTS_PER_PAGE', 20) < count
     }
  
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@read_only
 def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-
-  # Initialize the current time and the data dictionary to be passed back  
-  time_now = datetime.now() 
-  data = []
-
-  # Get the requested venues from the list
-  venue = Venue.query.get(venue_id)
+  # shows the venue page with the given venue_id, the past shows can be paged via ?past_page=
+  data = venue_detail(venue_id, past_page=request.args.get('past_page', 1, type=int))
 
   # Check if venue returned a valid statement to catch invalid requests
 
-  if not venue:
+  if not data:
       # Cause some controlled reaction and redirect to index location
-      return redirect(url_for('index'))
+      return redirect(url_for('main.index'))
   else:
-      # Prepare the venue entries which can be directly obtained
-      data = {
-          "id": venue.id,
-          "name": venue.name,
-          # Genres need to be converted to a list to work with the template
-          "genres": venue.genres[1:-1].split(','),
-          "address": venue.address,
-          "city": venue.city,
-          "state": venue.state,
-          "phone": venue.phone,
-          "website": venue.website,
-          "facebook_link": venue.facebook_link,
-          "seeking_talent": venue.seeking_talent,
-          "seeking_description": venue.seeking_description,
-          "image_link": venue.image_link
-      }
-
-      #Initialize past and future show entries
-      past_show_part = []
-      upcoming_show_part = []
-      upcoming_show_count = 0
-      past_show_count = 0
-
-      # Create a list of the shows in the specific venue
-      venue_shows = Show.query.filter_by(venue_id=venue.id).all()
-          
-      # Loop through shows and check whether start time is in the future    
-      for show in venue_shows:
-          if show.start_time > time_now:
-              upcoming_show_count += 1
-              upcoming_show_part.append({
-                  "artist_id": show.artist_id,
-                  "artist_name": show.artist.name,
-                  "artist_image_link": show.artist.image_link,
-                  "start_time": format_datetime(str(show.start_time), format='medium')
-              })
-
-          else:
-              past_show_count += 1
-        
-              past_show_part.append({
-                  "artist_id": show.artist_id,
-                  "artist_name": show.artist.name,
-                  "artist_image_link": show.artist.image_link,
-                  "start_time": format_datetime(str(show.start_time), format='medium')
-              })
-        
-      # Append the show-related data to data
-        
-      data["upcoming_shows"] = upcoming_show_part
-      data["upcoming_shows_count"] = upcoming_show_count
-      data["past_shows"] = past_show_part
-      data["past_shows_count"] = past_show_count
-
       return render_template('pages/show_venue.html', venue=data)
  
 
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@main.route('/autocomplete')
+@read_only
+def autocomplete():
+    # venue and artist names with a word starting with ?q=, answered from the
+    # in-memory name index (see autocomplete.py), at most ?limit= hits
+    limit = min(max(request.args.get('limit', current_app.config.get('AUTOCOMPLETE_RESULTS', 10), type=int), 1), 50)
+    hits = name_index.lookup(request.args.get('q', ''), limit=limit)
+
+    for hit in hits:
+        hit["url"] = '/{0}s/{1}'.format(hit["type"], hit["id"])
+
+    return json_response({"data": hits})
+
+#  Analytics
+#  ----------------------------------------------------------------
+
+@main.route('/analytics/<dimension>/<path:key>')
+@page_cache.cached('venues', 'artists', 'shows')
+@read_only
+def analytics(dimension, key):
+    # monthly show counts, busiest weekdays and genre mix of a venue
+    # (/analytics/venue/<id>), artist, city (/analytics/city/San Francisco, CA)
+    # or genre, over the last ?months= months
+    data = show_analytics(dimension, key, months=request.args.get('months', type=int))
+    if data is None:
+        abort(404)
+    return render_template('pages/analytics.html', analytics=data)
+
+#  Matchmaking
+#  ----------------------------------------------------------------
+
+def match_limit():
+    return min(max(request.args.get('limit', current_app.config.get('MATCH_RESULTS', 20), type=int), 1), 100)
+
+@main.route('/venues/<int:venue_id>/matches')
+@read_only
+def venue_matches(venue_id):
+    # artists suggested for the venue, ranked by shared genres, same city and
+    # whether they are seeking a venue (see matchmaking.py), at most ?limit=
+    profile = match_index.profile('venue', venue_id)
+    if profile is None:
+        return redirect(url_for('main.index'))
+    matches = match_index.matches('venue', venue_id, limit=match_limit())
+    return render_template('pages/matches.html', kind='venue', entity_id=venue_id, profile=profile, matches=matches or [])
+
+@main.route('/artists/<int:artist_id>/matches')
+@read_only
+def artist_matches(artist_id):
+    # venues suggested for the artist, see venue_matches()
+    profile = match_index.profile('artist', artist_id)
+    if profile is None:
+        return redirect(url_for('main.index'))
+    matches = match_index.matches('artist', artist_id, limit=match_limit())
+    return render_template('pages/matches.html', kind='artist', entity_id=artist_id, profile=profile, matches=matches or [])
+
+#  Venue availability
+#  ----------------------------------------------------------------
+
+@main.route('/venues/availability')
+@page_cache.cached('venues', 'shows')
+@read_only
+def venue_availability_search():
+  # venues free for a whole time window, e.g. in San Francisco on Friday 8pm - 11pm:
+  # ?city=San Francisco&start=2026-10-23 20:00&end=2026-10-23 23:00[&state=CA][&genre=Jazz]
+  search = {name: request.args.get(name, '').strip() for name in ('city', 'state', 'genre', 'start', 'end')}
+
+  data = None
+  error = None
+  if search['start']:
+      try:
+          window_start, window_end = parse_time_window(search['start'], search['end'])
+          data = venue_availability(window_start, window_end, city=search['city'],
+                                    state=search['state'], genre=search['genre'])
+      except ValueError as parse_error:
+          error = str(parse_error)
+
+  return render_template('pages/venue_availability.html', search=search, venues=data, error=error)
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
   # As defined in forms.py
+  from forms import VenueForm
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   # As defined in forms.py
+  from forms import VenueForm
   form = VenueForm(request.form)
 
   # Obtain the individual data from the form
@@ -334,7 +1021,7 @@ def create_venue_submission():
   if not form.validate():
     flash( form.errors )
     
-    return redirect(url_for('create_venue_submission'))
+    return redirect(url_for('main.create_venue_submission'))
 
   # Initialize error flag to false
   error = False
@@ -365,209 +1052,118 @@ def create_venue_submission():
   
   return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+    # Delete the venue together with its shows
+    return delete_listing(Venue, venue_id)
+
+def delete_listing(model, entity_id):
    # Initialize error flag to false
     error = False
+    deleted = []
 
-    # Try to get json description string and commit to database
+    # Delete with a single statement, the shows go with it (see delete_listings)
     try:
-        # Get the database item to be deleted
-        delvenue = Venue.query.get(venue_id)
-        # Store the name for the error message below
-        delvenue_name = delvenue.name
-        db.session.delete(delvenue)
-        db.session.commit()
+        deleted = delete_listings(model, [entity_id])
     # In case try fails set error to true and call rollback 
     except:
         error = True
         db.session.rollback()
-    # At the end, close connection and refresh overall page
+        print(sys.exc_info())
+    # At the end, close connection
     finally:
         db.session.close()
     if error == True:
-        flash('An error occurred. Venue ' + delvenue_name + ' could not be deleted.')
         abort(500)
-    else:
-        return jsonify({'Deletion success': True})
-
-
-
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
+    if not deleted:
+        abort(404)
+    return jsonify({'Deletion success': True})
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@page_cache.cached('artists')
+@read_only
 def artists():
 
-# Initialize the data dictionary to be passed back  
-  data = []
-
-  # Get all artists from the list (sorted by artist name)
-  artist_list = Artist.query.order_by(Artist.name).all()
-
-  # Prepare the id and artist entry by looping through venue list
-  for artist_item in artist_list:
-      artist_entry = {
-          "id": artist_item.id,
-          "name": artist_item.name
-      }
-
-      # Append the entry to the data 
-      data.append(artist_entry)
+  # Get all artists sorted by name, optionally restricted to one genre (?genre=Jazz)
+  data = artist_listing(genre=request.args.get('genre', '').strip())
 
   return render_template('pages/artists.html', artists=data)
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
-  # search for artists, case-insensitive
+  # search for artists, case-insensitive and ranked by relevance
 
-    # Get the search string from the search form request
+    # Get the search string and the requested result page from the search form request
     search_term = request.form.get('search_term', '').strip()
+    page = request.form.get('page', 1, type=int)
+
+    # Get the matching artists together with their upcoming show count in one statement
+    count, search_result = search_by_name(Artist, search_term, page=page)
 
-    # Initialize the current time and the search result to be passed back  
-    time_now = datetime.now() 
-    count = 0
-    search_result = []
-
-    # Get the matching artists from the list by using alike for case insensitive search + wildcard characters around it
-    artists_search_list = Artist.query.filter(Artist.name.ilike('%'+search_term+'%')).all()
-
-    # Loop through the list of artists to produce the proper entries
-    for artist in artists_search_list:
-        # Count entries and prepare the artist entries which can be directly obtained
-        count +=1
-        search_entry = {
-            "id": artist.id,
-            "name": artist.name
-        }
-
-        #Initialize future showcount
-        upcoming_show_count = 0
-
-        # Create a list of the shows for the specific artist
-        artist_shows = Show.query.filter_by(artist_id=artist.id).all()
-          
-        # Loop through shows and check whether start time is in the future    
-        for show in artist_shows:
-            if show.start_time > time_now:
-                upcoming_show_count += 1
-        
-        search_entry["num_upcoming_shows"] = upcoming_show_count
-
-        # Append the show-related data to search result
-        search_result.append(search_entry)
-        
     # Create the response entry
     response = {
         "count": count,
-        "data": search_result
+        "data": search_result,
+        "page": page,
+        "has_next": page * current_app.config.get('SEARCH_RESULTS_PER_PAGE', 20) < count
     }
 
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@read_only
 def show_artist(artist_id):
-    # shows the artist page with the given 
-  
-    # Initialize the current time and the data dictionary to be passed back  
-    time_now = datetime.now() 
-    data = []
-
-    # Get the requested artist from the list
-    artist = Artist.query.get(artist_id)
+    # shows the artist page with the given artist_id, the past shows can be paged via ?past_page=
+    data = artist_detail(artist_id, past_page=request.args.get('past_page', 1, type=int))
 
     # Check if artist returned a valid statement to catch invalid requests
 
-    if not artist:
+    if not data:
         # Cause some controlled reaction and redirect to index location
-        redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     else:
-        # Prepare the artist entries which can be directly obtained
-        data = {
-            "id": artist.id,
-            "name": artist.name,
-            "genres": artist.genres[1:-1].split(','),
-            "city": artist.city,
-            "state": artist.state,
-            "phone": artist.phone,
-            "website": artist.website,
-            "facebook_link": artist.facebook_link,
-            "seeking_venue": artist.seeking_venue,
-            "seeking_description": artist.seeking_description,
-            "image_link": artist.image_link
-        }
-
-        #Initialize past and future show entries
-        past_show_part = []
-        upcoming_show_part = []
-        upcoming_show_count = 0
-        past_show_count = 0
-
-        # Create a list of the shows for the specific artist
-        artist_shows = Show.query.filter_by(artist_id=artist.id).all()
-          
-        # Loop through shows and check whether start time is in the future    
-        for show in artist_shows:
-            if show.start_time > time_now:
-                upcoming_show_count += 1
-
-                upcoming_show_part.append({
-                    "venue_id": show.venue_id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": format_datetime(str(show.start_time), format='medium')
-                })
-
-            else:
-                past_show_count += 1
-        
-                past_show_part.append({
-                    "venue_id": show.venue_id,
-                    "venue_name": show.venue.name,
-                    "venue_image_link": show.venue.image_link,
-                    "start_time": format_datetime(str(show.start_time), format='medium')
-                })
-        
-        # Append the show-related data to data
-        
-        data["upcoming_shows"] = upcoming_show_part
-        data["upcoming_shows_count"] = upcoming_show_count
-        data["past_shows"] = past_show_part
-        data["past_shows_count"] = past_show_count
-
         return render_template('pages/show_artist.html', artist=data)
 
+@main.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    # Delete the artist together with its shows
+    return delete_listing(Artist, artist_id)
+
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
 
   # Get the existing artist from the database
   artist = Artist.query.get(artist_id)
 
   # Polulate the form with the queried artist data
+  from forms import ArtistForm
   form = ArtistForm(obj=artist)
 
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
  
   # Get the existing venue from the database
   venue = Venue.query.get(venue_id)
 
   # Polulate the form with the queried artist data
+  from forms import VenueForm
   form = VenueForm(obj=venue)
 
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
 # As defined in forms.py
+  from forms import ArtistForm
   form = ArtistForm(request.form)
 
   # Obtain the individual data from the form
@@ -591,7 +1187,7 @@ def edit_artist_submission(artist_id):
   if not form.validate():
     
     flash( form.errors )
-    return redirect(url_for('create_venue_submission'))
+    return redirect(url_for('main.create_venue_submission'))
 
   # Initialize error flag to false
   error = False
@@ -600,18 +1196,19 @@ def edit_artist_submission(artist_id):
     # Get the artist entry to update from the database
     artist = Artist.query.get(artist_id)
 
-    # Overwrite the existing venue data fields with the data from the form
-
-    artist.name = name
-    artist.city = city  
-    artist.state = state
-    artist.phone = phone
-    artist.image_link = image_link
-    artist.genres = genres
-    artist.facebook_link = facebook_link
-    artist.website = website
-    artist.seeking_venue = seeking_venue
-    artist.seeking_description = seeking_description
+    # Overwrite the existing venue data fields with the data from the form,
+    # new genres move the artist's shows in the analytics rollups
+    with rekeyed_rollups('artist_id', artist_id, changed=list(artist.genres or []) != genres):
+      artist.name = name
+      artist.city = city  
+      artist.state = state
+      artist.phone = phone
+      artist.image_link = image_link
+      artist.genres = genres
+      artist.facebook_link = facebook_link
+      artist.website = website
+      artist.seeking_venue = seeking_venue
+      artist.seeking_description = seeking_description
    
     db.session.commit()
   except:
@@ -629,11 +1226,12 @@ def edit_artist_submission(artist_id):
   else:
     flash('An error occurred. Artist ' + name + ' could not be updated.')
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('main.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
 # As defined in forms.py
+  from forms import VenueForm
   form = VenueForm()
 
   # Obtain the individual data from the form
@@ -659,7 +1257,7 @@ def edit_venue_submission(venue_id):
   if not form.validate():
     #flash('The entries were not correctly filled, the following errors ocurred:' form.errors )
     flash( form.errors )
-    return redirect(url_for('create_venue_submission'))
+    return redirect(url_for('main.create_venue_submission'))
   """
   # Initialize error flag to false
   error = False
@@ -668,19 +1266,20 @@ def edit_venue_submission(venue_id):
     # Get the venue entry to update from the database
     venue = Venue.query.get(venue_id)
 
-    # Overwrite the existing venue data fields with the data from the form
-
-    venue.name = name
-    venue.city = city  
-    venue.state = state
-    venue.address = address
-    venue.phone = phone
-    venue.image_link = image_link
-    venue.genres = genres
-    venue.facebook_link = facebook_link
-    venue.website = website
-    venue.seeking_talent = seeking_talent
-    venue.seeking_description = seeking_description
+    # Overwrite the existing venue data fields with the data from the form,
+    # a new city / state moves the venue's shows in the analytics rollups
+    with rekeyed_rollups('venue_id', venue_id, changed=(venue.city, venue.state) != (city, state)):
+      venue.name = name
+      venue.city = city  
+      venue.state = state
+      venue.address = address
+      venue.phone = phone
+      venue.image_link = image_link
+      venue.genres = genres
+      venue.facebook_link = facebook_link
+      venue.website = website
+      venue.seeking_talent = seeking_talent
+      venue.seeking_description = seeking_description
    
     db.session.commit()
   except:
@@ -698,19 +1297,21 @@ def edit_venue_submission(venue_id):
   else:
     flash('An error occurred. Venue ' + name + ' could not be updated.')
 
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
+  from forms import ArtistForm
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
 # As defined in forms.py
+  from forms import ArtistForm
   form = ArtistForm()
 
   # Obtain the individual data from the form
@@ -735,7 +1336,7 @@ def create_artist_submission():
   #if not form.validate():
     #flash('The entries were not correctly filled, the following errors ocurred:' form.errors )
     #flash( form.errors )
-    #return redirect(url_for('create_artist_submission'))
+    #return redirect(url_for('main.create_artist_submission'))
 
   # Initialize error flag to false
   error = False
@@ -771,42 +1372,60 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@page_cache.cached('shows')
+@read_only
 def shows():
-    # displays list of shows
-    
-
-    # Initialize the data dictionary to be passed back  
-    data = []
+    # displays list of shows, keyset paginated on (start_time, id)
+    # ?when=upcoming (default) lists upcoming shows soonest first,
+    # ?when=past lists past shows most recent first,
+    # ?after=<start_time>_<id> continues after the last show of the previous page
+    when = 'past' if request.args.get('when') == 'past' else 'upcoming'
 
-    # Get all shows from the list
-    show_list = Show.query.all()
+    data, next_cursor = show_listing(when=when, after=request.args.get('after', ''))
 
-     # Prepare the show entries by looping through show list
-    for show_item in show_list:
-        show_entry = {
-          "venue_id": show_item.venue.id,
-          "venue_name": show_item.venue.name,
-          "artist_id": show_item.artist.id,
-          "artist_name": show_item.artist.name,
-          "artist_image_link": show_item.artist.image_link,
-          "start_time": format_datetime(str(show_item.start_time), format='medium')
-            }
+    return render_template('pages/shows.html', shows=data, when=when, next_cursor=next_cursor)
 
-        # Append the entry to the data
-        data.append(show_entry)
-
-    return render_template('pages/shows.html', shows=data)
+#  Calendar
+#  ----------------------------------------------------------------
 
-@app.route('/shows/create')
+@main.route('/calendar')
+@page_cache.cached('venues', 'shows')
+@read_only
+def calendar():
+    # shows by day for the month (default) or week containing ?date=YYYY-MM-DD,
+    # ?view=week switches to the week view, ?city= keeps one city's venues
+    view, first_day, end_day = calendar_window(request.args.get('view', 'month'), request.args.get('date', '').strip())
+    city = request.args.get('city', '').strip()
+
+    shows_by_day = {entry["day"]: entry["shows"] for entry in show_calendar(first_day, end_day, city=city)}
+
+    # Whole weeks from the Monday on or before the first day, for the calendar grid
+    grid_day = first_day - timedelta(days=first_day.weekday())
+    weeks = []
+    while grid_day < end_day:
+        weeks.append([{
+            "day": grid_day + timedelta(days=offset),
+            "in_window": first_day <= grid_day + timedelta(days=offset) < end_day,
+            "shows": shows_by_day.get(grid_day + timedelta(days=offset), [])
+        } for offset in range(7)])
+        grid_day += timedelta(days=7)
+
+    return render_template('pages/calendar.html', view=view, city=city, weeks=weeks,
+                           first_day=first_day, end_day=end_day,
+                           previous_day=first_day - timedelta(days=1), next_day=end_day)
+
+@main.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
+  from forms import ShowForm
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
 # As defined in forms.py
+  from forms import ShowForm
   form = ShowForm()
 
   # Obtain the individual data from the form
@@ -814,24 +1433,37 @@ def create_show_submission():
   artist_id = request.form['artist_id']
   venue_id = request.form['venue_id']
   start_time = request.form['start_time']
+  end_time = request.form.get('end_time', '').strip()
  
   # Perform the form validation run
   """
   if not form.validate():
     #flash('The entries were not correctly filled, the following errors ocurred:' form.errors )
     flash( form.errors )
-    return redirect(url_for('create_venue_submission'))
+    return redirect(url_for('main.create_venue_submission'))
   """
-  # Initialize error flag to false
+  # Initialize error flags to false
   error = False
+  double_booked = False
 
   try:
+    # Shows without an end time last SHOW_DEFAULT_DURATION minutes
+    start_time, end_time = parse_time_window(start_time, end_time)
+
     # Try to create a new database entry with the provided forms data 
-    new_show_entry = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time
-                )
+    new_show_entry = Show(artist_id=int(artist_id), venue_id=int(venue_id), start_time=start_time, end_time=end_time)
 
     db.session.add(new_show_entry)
+    # Update the venue and artist show counters and the analytics rollups in the same transaction
+    count_new_show(new_show_entry)
+    roll_up_new_show(new_show_entry)
     db.session.commit()
+  except IntegrityError as integrity_error:
+    error = True
+    # 23P01 exclusion_violation: the venue already has a show in that time
+    double_booked = getattr(integrity_error.orig, 'pgcode', None) == '23P01'
+    db.session.rollback()
+    print(sys.exc_info())
   except:
     # Standard procedure for error handling
     error = True
@@ -844,21 +1476,553 @@ def create_show_submission():
   # on successful db insert, flash success
   if error == False:
     flash('Show was successfully listed!')
+  elif double_booked:
+    flash('The venue is already booked at that time. Show could not be listed.')
   else:
     flash('An error occurred. Show could not be listed.')
   
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+# JSON version of the listing, detail and search pages, built from the same
+# query functions as the HTML views
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def json_default(value):
+  # Dates and datetimes are serialized as ISO 8601 strings
+  if isinstance(value, (date, datetime)):
+    return value.isoformat()
+  raise TypeError(repr(value) + ' is not JSON serializable')
+
+def dumps(value):
+  if orjson is not None:
+    return orjson.dumps(value, default=json_default).decode('utf-8')
+  return json.dumps(value, default=json_default, separators=(',', ':'))
+
+def list_response(items, **fields):
+  # {"<fields>": ..., "data": [items]}, encoded in one call
+  return json_response(dict(fields, data=items))
+
+def stream_json(items, **fields):
+  # Stream {"<fields>": ..., "data": [items]} from an iterator item by item,
+  # so an unbounded listing is never held in memory, neither as a list nor
+  # as one encoded string. The first item is read before the response is
+  # returned: the query then runs inside the view, where the read-only
+  # routing, the query budget and the Server-Timing header see it and an
+  # error still turns into an error response.
+  items = iter(items)
+  first = next(items, None)
+
+  def generate():
+    yield '{'
+    for key, value in fields.items():
+      yield dumps(key) + ':' + dumps(value) + ','
+    yield '"data":['
+    if first is not None:
+      yield dumps(first)
+      for item in items:
+        yield ',' + dumps(item)
+    yield ']}'
+  return Response(stream_with_context(generate()), mimetype='application/json')
+
+def json_response(data, status=200):
+  return Response(dumps(data), status=status, mimetype='application/json')
+
+def conditional(*tags):
+  # Answer with 304 Not Modified when the client copy is current. The ETag and
+  # Last-Modified values come from the page cache generations of tags and the
+  # current PAGE_CACHE_TIMEOUT period (see PageCache.validators), so a
+  # matching request does not touch the database and a client copy is never
+  # older than one period.
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      etag, last_modified = page_cache.validators(tags)
+      if_modified_since = request.if_modified_since
+      if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+      else:
+        not_modified = if_modified_since is not None and \
+          if_modified_since.replace(tzinfo=timezone.utc).timestamp() >= last_modified
+
+      if not_modified:
+        response = Response(status=304)
+      else:
+        response = view(*args, **kwargs)
+        # Errors (400, 404) are not cached by the client, they carry no validators
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag)
+      response.last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+      return response
+    return wrapper
+  return decorator
+
+def bulk_delete(model):
+  # Shared by the bulk delete endpoints, answers with the ids actually deleted
+  ids = (request.get_json(silent=True) or {}).get('ids')
+  if not isinstance(ids, list) or not all(isinstance(entity_id, int) and not isinstance(entity_id, bool) for entity_id in ids):
+    return json_response({"error": "Expected a JSON body {\"ids\": [<id>, ...]}"}, 400)
+  try:
+    deleted = delete_listings(model, ids)
+  except:
+    db.session.rollback()
+    raise
+  finally:
+    db.session.close()
+  return json_response({"deleted": deleted, "count": len(deleted)})
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@conditional('venues')
+@read_only
+def api_venues():
+  # Venues grouped by city / state, optionally restricted to one genre (?genre=Jazz)
+  return stream_json(iter_venue_areas(genre=request.args.get('genre', '').strip()))
+
+@api.route('/venues/search')
+@conditional('venues')
+@read_only
+def api_search_venues():
+  # Ranked venue search, ?q=<term>&page=<page>
+  page = request.args.get('page', 1, type=int)
+  count, data = search_by_name(Venue, request.args.get('q', '').strip(), page=page)
+  return list_response(data, count=count, page=page)
+
+@api.route('/venues/availability')
+@conditional('venues', 'shows')
+@read_only
+def api_venue_availability():
+  # Venues free from ?start= to ?end= (default one show duration), optionally ?city=, ?state=, ?genre=
+  try:
+    window_start, window_end = parse_time_window(request.args.get('start', '').strip(),
+                                                 request.args.get('end', '').strip())
+  except ValueError as error:
+    return json_response({"error": str(error)}, 400)
+  data = venue_availability(window_start, window_end,
+                            city=request.args.get('city', '').strip(),
+                            state=request.args.get('state', '').strip(),
+                            genre=request.args.get('genre', '').strip())
+  return list_response(data, start=window_start, end=window_end)
+
+@api.route('/venues', methods=['DELETE'])
+def api_delete_venues():
+  # Delete many venues and their shows at once, body {"ids": [1, 2, ...]}
+  return bulk_delete(Venue)
+
+@api.route('/venues/<int:venue_id>')
+@conditional('shows')
+@read_only
+def api_venue(venue_id):
+  data = venue_detail(venue_id, past_page=request.args.get('past_page', 1, type=int))
+  if not data:
+    return json_response({"error": "Venue not found"}, 404)
+  return json_response(data)
+
+@api.route('/venues/<int:venue_id>/matches')
+@conditional('matches')
+@read_only
+def api_venue_matches(venue_id):
+  # Artists suggested for the venue, best first, at most ?limit=
+  data = match_index.matches('venue', venue_id, limit=match_limit())
+  if data is None:
+    return json_response({"error": "Venue not found"}, 404)
+  return json_response({"data": data})
+
+#  Analytics
+#  ----------------------------------------------------------------
+
+@api.route('/analytics/<dimension>/<path:key>')
+@conditional('venues', 'artists', 'shows')
+@read_only
+def api_analytics(dimension, key):
+  # See analytics() for the dimensions and ?months=
+  data = show_analytics(dimension, key, months=request.args.get('months', type=int))
+  if data is None:
+    return json_response({"error": "Unknown {0}".format(dimension if dimension in ANALYTICS_DIMENSIONS else 'dimension')}, 404)
+  return json_response(data)
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+@api.route('/calendar')
+@conditional('venues', 'shows')
+@read_only
+def api_calendar():
+  # Shows by day, see calendar() for ?view=, ?date= and ?city=
+  view, first_day, end_day = calendar_window(request.args.get('view', 'month'), request.args.get('date', '').strip())
+  data = show_calendar(first_day, end_day, city=request.args.get('city', '').strip())
+  return list_response(data, view=view, start=first_day, end=end_day)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@conditional('artists')
+@read_only
+def api_artists():
+  # Artists sorted by name, optionally restricted to one genre (?genre=Jazz)
+  return stream_json(iter_artist_listing(genre=request.args.get('genre', '').strip()))
+
+# The artist hits carry upcoming show counts, hence the 'shows' tag
+@api.route('/artists/search')
+@conditional('shows')
+@read_only
+def api_search_artists():
+  # Ranked artist search, ?q=<term>&page=<page>
+  page = request.args.get('page', 1, type=int)
+  count, data = search_by_name(Artist, request.args.get('q', '').strip(), page=page)
+  return list_response(data, count=count, page=page)
+
+@api.route('/artists', methods=['DELETE'])
+def api_delete_artists():
+  # Delete many artists and their shows at once, body {"ids": [1, 2, ...]}
+  return bulk_delete(Artist)
+
+@api.route('/artists/<int:artist_id>')
+@conditional('shows', 'recommendations')
+@read_only
+def api_artist(artist_id):
+  data = artist_detail(artist_id, past_page=request.args.get('past_page', 1, type=int))
+  if not data:
+    return json_response({"error": "Artist not found"}, 404)
+  return json_response(data)
+
+@api.route('/artists/<int:artist_id>/matches')
+@conditional('matches')
+@read_only
+def api_artist_matches(artist_id):
+  # Venues suggested for the artist, best first, at most ?limit=
+  data = match_index.matches('artist', artist_id, limit=match_limit())
+  if data is None:
+    return json_response({"error": "Artist not found"}, 404)
+  return json_response({"data": data})
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@conditional('shows')
+@read_only
+def api_shows():
+  # Keyset paginated shows, see shows() for ?when= and ?after=
+  when = 'past' if request.args.get('when') == 'past' else 'upcoming'
+  data, next_cursor = show_listing(when=when, after=request.args.get('after', ''))
+  return list_response(data, next=next_cursor)
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def find_seq_scans(plan, found):
+  # Walk an EXPLAIN (FORMAT JSON) plan tree and collect the sequentially scanned tables
+  if plan.get('Node Type') == 'Seq Scan':
+    found.add(plan['Relation Name'])
+  for child in plan.get('Plans', []):
+    find_seq_scans(child, found)
+  return found
+
+@main.cli.command('index-advisor')
+@click.option('--min-rows', default=1000, show_default=True,
+              help='Only report sequential scans on tables with at least this many rows.')
+def index_advisor(min_rows):
+  """Run EXPLAIN on the queries of every route and report sequential scans on large tables."""
+  statements = []
+  # The endpoint being driven, set before each request: the detail pages run
+  # some statements on other threads (run_concurrently), outside the request context
+  driven = {'endpoint': None}
+
+  def record_statement(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith('SELECT'):
+      statements.append((driven['endpoint'], statement, parameters))
+
+  samples = sample_arguments()
+  db.session.close()
+
+  # Drive every GET route and both searches through the test client while recording the statements
+  db.event.listen(db.engine, 'before_cursor_execute', record_statement)
+  try:
+    with current_app.test_client() as client:
+      for rule in current_app.url_map.iter_rules():
+        # Static files and the built assets (assets.py) run no queries
+        if rule.endpoint == 'static' or rule.endpoint.endswith('.static') or \
+            rule.rule.startswith(current_app.static_url_path + '/'):
+          continue
+        driven['endpoint'] = rule.endpoint
+        if 'GET' in rule.methods:
+          responses = [(url, client.get(url)) for url in sample_urls(rule, samples)]
+        elif rule.endpoint in ('main.search_venues', 'main.search_artists'):
+          responses = [(rule.rule, client.post(rule.rule, data={'search_term': 'a'}))]
+        else:
+          continue
+        for url, response in responses:
+          if response.status_code != 200:
+            click.echo('{0}: {1} answered {2}, its queries are not checked'.format(
+                rule.endpoint, url, response.status_code), err=True)
+  finally:
+    db.event.remove(db.engine, 'before_cursor_execute', record_statement)
+
+  # Current table sizes from the planner statistics
+  table_rows = dict(db.session.execute(
+      "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r'").fetchall())
+
+  connection = db.engine.raw_connection()
+  warnings = 0
+  try:
+    cursor = connection.cursor()
+    for endpoint, statement, parameters in statements:
+      cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+      plan = cursor.fetchone()[0][0]['Plan']
+      for table in sorted(find_seq_scans(plan, set())):
+        if table_rows.get(table, 0) >= min_rows:
+          warnings += 1
+          click.echo('{0}: sequential scan on {1} ({2} rows)'.format(endpoint, table, table_rows[table]))
+          click.echo('    ' + ' '.join(statement.split()))
+  finally:
+    connection.close()
+
+  click.echo('{0} statements checked, {1} sequential scans on tables above {2} rows.'.format(
+      len(statements), warnings, min_rows))
+
+def sample_arguments():
+  # Route arguments taken from existing rows, so the routes find what they
+  # look up and run their queries instead of answering 404
+  venue = db.session.query(Venue.id, Venue.city, Venue.state).order_by(Venue.id).first()
+  artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+  genre = db.session.query(db.func.unnest(Venue.genres)).limit(1).scalar()
+  first_show = db.session.query(db.func.min(Show.start_time)).scalar() or datetime.now()
+  city, state = (venue.city, venue.state) if venue else ('San Francisco', 'CA')
+  return {
+      'venue_id': venue.id if venue else 1,
+      'artist_id': artist_id or 1,
+      'city': city,
+      'state': state,
+      'genre': genre or 'Jazz',
+      'date': first_show.strftime('%Y-%m-%d'),
+      'start': first_show.strftime('%Y-%m-%dT%H:%M')
+  }
+
+def sample_urls(rule, samples):
+  # Concrete URLs for a GET route: the id arguments filled with sample ids,
+  # the analytics routes once per dimension and the query strings the
+  # searching routes need to run their queries
+  arguments = [{argument: samples.get(argument, 1) for argument in rule.arguments}]
+  if rule.arguments == {'dimension', 'key'}:
+    arguments = [
+        {'dimension': 'venue', 'key': samples['venue_id']},
+        {'dimension': 'artist', 'key': samples['artist_id']},
+        {'dimension': 'city', 'key': '{0}, {1}'.format(samples['city'], samples['state'])},
+        {'dimension': 'genre', 'key': samples['genre']}
+    ]
+  query = {
+      'main.venue_availability_search': {'city': samples['city'], 'start': samples['start']},
+      'api.api_venue_availability': {'city': samples['city'], 'start': samples['start']},
+      'main.calendar': {'date': samples['date']},
+      'api.api_calendar': {'date': samples['date']},
+      'main.autocomplete': {'q': 'a'},
+      'api.api_search_venues': {'q': 'a'},
+      'api.api_search_artists': {'q': 'a'}
+  }.get(rule.endpoint, {})
+  with current_app.test_request_context():
+    return [url_for(rule.endpoint, **dict(values, **query)) for values in arguments]
+
+@main.cli.command('load')
+@click.argument('table', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and written per batch.')
+@click.option('--method', type=click.Choice(['copy', 'insert']), default='copy', show_default=True,
+              help='Postgres COPY or executemany INSERT.')
+def load(table, path, chunk_size, method):
+  """Bulk load venues, artists or shows from a CSV or NDJSON file.
+
+  Shows reference their artist and venue by artist_id / venue_id or by
+  artist_name / venue_name, shows without end_time last SHOW_DEFAULT_DURATION
+  minutes. Invalid rows are reported and skipped, all valid rows are written
+  in one transaction (a show double booking its venue aborts the load).
+  """
+  import loader
+  show_duration = timedelta(minutes=current_app.config.get('SHOW_DEFAULT_DURATION', 180))
+  table_object = {'venues': Venue, 'artists': Artist, 'shows': Show}[table].__table__
+
+  # Resolve show foreign keys through in-memory maps instead of one lookup per row
+  references = None
+  if table == 'shows':
+    references = {
+        'artist': loader.build_reference_map(db.session.query(Artist.id, Artist.name)),
+        'venue': loader.build_reference_map(db.session.query(Venue.id, Venue.name))
+    }
+    db.session.close()
+
+  loaded = 0
+  failed = 0
+  started = time.perf_counter()
+
+  with db.engine.begin() as connection:
+    row_number = 1
+    for chunk in loader.chunked(loader.read_rows(path), chunk_size):
+      rows, errors = loader.validate_chunk(table, chunk, row_number, references, show_duration)
+      row_number += len(chunk)
+
+      for error_row, message in errors:
+        click.echo('row {0}: {1}'.format(error_row, message), err=True)
+      failed += len(errors)
+
+      if rows:
+        if method == 'copy':
+          loader.copy_rows(connection.connection, table, rows)
+        else:
+          loader.insert_rows(connection, table_object, rows)
+      loaded += len(rows)
+
+      elapsed = time.perf_counter() - started
+      click.echo('{0} rows loaded, {1} skipped, {2:.0f} rows/s'.format(loaded, failed, loaded / elapsed if elapsed else 0))
+
+  # Bulk loaded shows are not counted one by one, recompute the show counters and rollups instead
+  if table == 'shows':
+    rebuild_show_counters()
+    rebuild_show_rollups()
+
+  # The bulk writes bypass the ORM session, so the cached pages are invalidated by hand
+  if table == 'shows':
+    page_cache.invalidate('venues', 'shows')
+  else:
+    page_cache.invalidate(table, 'shows', 'names', 'matches')
+
+  elapsed = time.perf_counter() - started
+  click.echo('Loaded {0} {1} in {2:.1f}s ({3:.0f} rows/s), {4} rows skipped.'.format(
+      loaded, table, elapsed, loaded / elapsed if elapsed else 0, failed))
+
+@main.cli.group('counters')
+def counters():
+  """Maintain the upcoming / past show counters of venues and artists."""
+
+@counters.command('roll')
+def counters_roll():
+  """Move shows that have started since the last run from upcoming to past (run periodically)."""
+  click.echo('Show counters rolled forward to {0}.'.format(roll_show_counters()))
+
+@counters.command('rebuild')
+def counters_rebuild():
+  """Recompute all show counters from the shows table."""
+  click.echo('Show counters rebuilt as of {0}.'.format(rebuild_show_counters()))
+
+@main.cli.group('analytics')
+def analytics_commands():
+  """Maintain the analytics rollups."""
+
+@analytics_commands.command('rebuild')
+def analytics_rebuild():
+  """Recompute the daily and monthly show rollups from the shows table."""
+  started = time.perf_counter()
+  rebuild_show_rollups()
+  click.echo('Show rollups rebuilt in {0:.1f}s.'.format(time.perf_counter() - started))
+
+@main.cli.group('recommendations')
+def recommendations():
+  """Maintain the precomputed similar artists."""
+
+@recommendations.command('rebuild')
+@click.option('--top-k', type=int, help='Similar artists stored per artist (default SIMILAR_ARTISTS_STORED).')
+def recommendations_rebuild(top_k):
+  """Recompute the similar artists of every artist from the venues they played (run periodically)."""
+  # NumPy and SciPy are only needed here
+  import similarity
+  started = time.perf_counter()
+  top_k = top_k or current_app.config.get('SIMILAR_ARTISTS_STORED', 20)
+
+  with db.engine.begin() as connection:
+    pairs = connection.execute(
+        'SELECT DISTINCT artist_id, venue_id FROM shows WHERE artist_id IS NOT NULL AND venue_id IS NOT NULL').fetchall()
+    # Replaced in one transaction, the detail pages read the previous table until the commit
+    connection.execute('DELETE FROM similar_artists')
+    written = similarity.copy_similar_artists(connection.connection, similarity.top_similar_artists(pairs, top_k=top_k))
+
+  # The table is written outside the ORM session, the cached API responses are invalidated by hand
+  page_cache.invalidate('recommendations')
+  click.echo('Stored {0} similar artists from {1} artist / venue pairs in {2:.1f}s.'.format(
+      written, len(pairs), time.perf_counter() - started))
+
+@main.cli.group('assets')
+def assets():
+  """Build the fingerprinted and precompressed static files."""
+
+@assets.command('build')
+def assets_build():
+  """Hash every file under static/ into static/dist/ with gzip and brotli variants."""
+  manifest = build_assets(current_app.static_folder)
+  click.echo('Built {0} assets into {1}.'.format(len(manifest), os.path.join(current_app.static_folder, 'dist')))
+
+@main.cli.group('templates')
+def templates():
+  """Manage the compiled Jinja templates."""
+
+@templates.command('compile')
+def templates_compile():
+  """Compile every template under templates/ into the bytecode cache."""
+  started = time.perf_counter()
+  names = preload_templates(current_app)
+  click.echo('Compiled {0} templates in {1:.2f}s into {2}.'.format(
+      len(names), time.perf_counter() - started, current_app.config.get('JINJA_BYTECODE_CACHE_DIR')))
+
+#----------------------------------------------------------------------------#
+# Application factory.
+#----------------------------------------------------------------------------#
+
+def create_app(config='config'):
+  # Build and configure the app. Everything done once per process lives here,
+  # `flask` finds this factory through FLASK_APP=app.py, gunicorn uses wsgi.py
+  app = Flask(__name__)
+
+  # Obtain local database configuration from config.py
+  app.config.from_object(config)
+
+  # Measure the pool checkout wait of every engine (see instrumentation.py)
+  app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})['poolclass'] = TimedQueuePool
+
+  moment.init_app(app)
+  db.init_app(app)
+  migrate.init_app(app, db)
+  request_metrics.init_app(app)
+  static_assets.init_app(app)
+  page_cache.init_app(app, db)
+  # After the page cache, its commit listener must run first
+  name_index.init_app(app, db, page_cache)
+  match_index.init_app(app, db, page_cache)
+
+  # Keep compiled templates on disk, so a new worker loads them instead of compiling
+  # ('flask templates compile' fills the cache at build time)
+  if app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+  app.jinja_env.filters['datetime'] = format_datetime
+
+  # Pool running independent queries of one request side by side (see
+  # run_concurrently), its threads only start with the first call, after a
+  # fork, and become greenlets in the cooperative serving mode (see serve_async.py).
+  # One slot per worker thread, each slot stands for one pooled connection.
+  query_workers = app.config.get('CONCURRENT_QUERY_WORKERS', 8)
+  app.extensions['query_executor'] = ThreadPoolExecutor(max_workers=query_workers)
+  app.extensions['query_slots'] = threading.BoundedSemaphore(query_workers)
+
+  app.register_blueprint(main)
+  app.register_blueprint(api)
+
+  if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
         Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
@@ -868,17 +2032,32 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+  if app.config.get('WARM_UP'):
+    warm_up(app)
+  return app
+
+def warm_up(app):
+  # Import the lazily loaded modules and load every template up front. Run in
+  # the gunicorn master (--preload), the forked workers share all of it copy
+  # on write and serve their first requests at warm latency. No database
+  # connection is opened here, connections must not be shared across a fork.
+  import dateutil.parser
+  import forms
+  for format in DATETIME_FORMATS.values():
+    compiled_datetime_pattern(format, 'en')
+  preload_templates(app)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
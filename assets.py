@@ -0,0 +1,166 @@
+## Fingerprinted, precompressed static assets
+##
+## 'flask assets build' copies every file under static/ to static/dist/ with
+## a content hash in its name (css/main.css -> css/main.1a2b3c4d.css), writes
+## gzip and brotli variants next to it and records the mapping in
+## static/dist/manifest.json. Templates link assets through asset_url(), which
+## returns the fingerprinted URL when the manifest has one and the plain
+## /static URL otherwise, so development works without a build.
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for, abort
+
+try:
+    # Optional, brotli variants are only written when the package is installed
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+DIST_DIRECTORY = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Types worth compressing, images and woff fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.html', '.txt', '.json'}
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+def fingerprinted_name(path, content):
+    root, extension = os.path.splitext(path)
+    return '{0}.{1}{2}'.format(root, hashlib.md5(content).hexdigest()[:8], extension)
+
+def rewrite_css_urls(css_path, css, manifest):
+    # Point relative url() references of a stylesheet at the fingerprinted files
+    def replace(match):
+        quote, target = match.group(1), match.group(2)
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', target).groups()
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(css_path), path))
+        if resolved in manifest:
+            # Both files live in dist/, keep the reference relative
+            relative = posixpath.relpath(manifest[resolved], posixpath.dirname(css_path))
+            return 'url({0}{1}{2}{0})'.format(quote, relative, suffix)
+        # Unknown files keep pointing at their original location
+        return 'url({0}/static/{1}{2}{0})'.format(quote, resolved, suffix)
+    return CSS_URL.sub(replace, css)
+
+def write_variants(path, content):
+    with open(path, 'wb') as output_file:
+        output_file.write(content)
+    if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        with open(path + '.gz', 'wb') as output_file:
+            output_file.write(gzip.compress(content, compresslevel=9))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as output_file:
+                output_file.write(brotli.compress(content, quality=11))
+
+def build_assets(static_folder):
+    # Build static/dist/ from scratch and return the manifest
+    dist_folder = os.path.join(static_folder, DIST_DIRECTORY)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+
+    sources = []
+    for directory, directories, files in os.walk(static_folder):
+        directories[:] = [name for name in directories if os.path.join(directory, name) != dist_folder]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            path = os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/')
+            sources.append(path)
+
+    # Stylesheets are hashed last, after the url() references in them were rewritten
+    manifest = {}
+    contents = {}
+    for path in sorted(sources, key=lambda path: path.endswith('.css')):
+        with open(os.path.join(static_folder, path), 'rb') as input_file:
+            content = input_file.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content.decode('utf-8'), manifest).encode('utf-8')
+        manifest[path] = fingerprinted_name(path, content)
+        contents[path] = content
+
+    for path, content in contents.items():
+        target = os.path.join(dist_folder, manifest[path])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_variants(target, content)
+
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+class Assets:
+    # Registers the asset_url() template helper and serves static/dist/ with
+    # far-future immutable caching and the best precompressed variant
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.load_manifest()
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.add_url_rule('/static/' + DIST_DIRECTORY + '/<path:filename>', 'dist_asset', self.send_asset)
+
+    def load_manifest(self):
+        path = os.path.join(self.app.static_folder, DIST_DIRECTORY, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            self.manifest = {}
+
+    def asset_url(self, filename):
+        if filename in self.manifest:
+            return url_for('dist_asset', filename=self.manifest[filename])
+        return url_for('static', filename=filename)
+
+    def send_asset(self, filename):
+        dist_folder = os.path.join(self.app.static_folder, DIST_DIRECTORY)
+        if filename == MANIFEST_NAME:
+            abort(404)
+
+        # Prefer brotli, then gzip, when the client accepts it and the variant exists
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in request.accept_encodings and os.path.exists(os.path.join(dist_folder, filename + suffix)):
+                encoding = candidate
+                break
+
+        if encoding is None:
+            response = send_from_directory(dist_folder, filename)
+        else:
+            response = send_from_directory(dist_folder, filename + ('.br' if encoding == 'br' else '.gz'),
+                                           mimetype=self.mimetype(filename))
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+
+        # The name changes with the content, so the file may be cached for good
+        response.headers['Cache-Control'] = 'public, max-age={0}, immutable'.format(self.app.config['ASSETS_MAX_AGE'])
+        return response
+
+    def mimetype(self, filename):
+        return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
@@ -0,0 +1,142 @@
+## In-process prefix index over venue and artist names for search-as-you-type
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import bisect
+import heapq
+import re
+import unicodedata
+
+from indexes import InMemoryIndex
+
+#----------------------------------------------------------------------------#
+# Normalization.
+#----------------------------------------------------------------------------#
+
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+def normalize(text):
+    # Lower case, accents removed, punctuation and runs of spaces collapsed:
+    # 'Café  Rouge!' -> 'cafe rouge'
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    return NON_ALPHANUMERIC.sub(' ', text.lower()).strip()
+
+def index_keys(name):
+    # A name is found from the start of every word: 'the blue room' is stored
+    # as 'the blue room', 'blue room' and 'room', with the word position
+    words = normalize(name).split()
+    return [(' '.join(words[position:]), position) for position in range(len(words))]
+
+#----------------------------------------------------------------------------#
+# Index.
+#----------------------------------------------------------------------------#
+
+class NameIndex(InMemoryIndex):
+    # Sorted array of (key, word position, kind, id, name) entries answering
+    # prefix lookups with a binary search, no database access. Commits go to a
+    # small sorted array of added entries and a set of removed ones, merged
+    # into the main array once they grow past a fraction of it, so a commit
+    # does not copy the whole index. The arrays are never changed once
+    # published: a write publishes a new (keys, entries, added, removed) tuple
+    # in one assignment, so lookups always see a consistent state without the lock.
+
+    # The delta is merged once it holds more than this many entries, or an
+    # eighth of the main array
+    MERGE_MIN = 1024
+
+    def __init__(self, tag='names'):
+        super().__init__(tag)
+        self.state = ((), (), (), frozenset())
+        # {(kind, id): name}, only used by writers under the lock
+        self.names = {}
+
+    def init_app(self, app, db, page_cache):
+        super().init_app(app, db, page_cache)
+        app.config.setdefault('AUTOCOMPLETE_RESULTS', 10)
+
+    #  Lookup
+    #  ----------------------------------------------------------------
+
+    def lookup(self, query, limit=10):
+        # Up to limit {"type", "id", "name"} hits whose name has a word
+        # starting with query, names starting with it first, then shorter names
+        query = normalize(query)
+        if not query:
+            return []
+        self.ensure_current()
+
+        keys, entries, added, removed = self.state
+        hits = {}
+
+        def collect(entry):
+            key, word, kind, entity_id, name = entry
+            if (kind, entity_id) not in hits or word < hits[(kind, entity_id)][0]:
+                hits[(kind, entity_id)] = (word, name)
+
+        # Collect a few more candidates than needed, the ranking below picks the best
+        position = bisect.bisect_left(keys, query)
+        found = 0
+        while position < len(keys) and keys[position].startswith(query) and found < limit * 4:
+            if entries[position] not in removed:
+                collect(entries[position])
+                found += 1
+            position += 1
+        position = bisect.bisect_left(added, (query,))
+        while position < len(added) and added[position][0].startswith(query):
+            collect(added[position])
+            position += 1
+
+        ranked = sorted(hits.items(), key=lambda hit: (hit[1][0], len(hit[1][1]), hit[1][1].lower()))
+        return [{"type": kind, "id": entity_id, "name": name} for (kind, entity_id), (word, name) in ranked[:limit]]
+
+    #  Maintenance
+    #  ----------------------------------------------------------------
+
+    def snapshot(self, instance):
+        return instance.name
+
+    def load(self):
+        # Every name with one query per indexed model, as (names, state)
+        entries = []
+        names = {}
+        for model, kind in self.models.items():
+            for entity_id, name in self.db.session.query(model.id, model.name):
+                names[(kind, entity_id)] = name
+                entries.extend((key, word, kind, entity_id, name) for key, word in index_keys(name))
+        entries.sort()
+        return names, (tuple(entry[0] for entry in entries), tuple(entries), (), frozenset())
+
+    def install(self, loaded):
+        self.names, self.state = loaded
+
+    def update(self, changes):
+        # Apply {(kind, id): name or None for deleted} to copies of the delta
+        keys, entries, added, removed = self.state
+        added, removed = list(added), set(removed)
+        for (kind, entity_id), name in changes.items():
+            old_name = self.names.pop((kind, entity_id), None)
+            if old_name is not None:
+                for key, word in index_keys(old_name):
+                    entry = (key, word, kind, entity_id, old_name)
+                    position = bisect.bisect_left(added, entry)
+                    if position < len(added) and added[position] == entry:
+                        del added[position]
+                    else:
+                        removed.add(entry)
+            if name is not None:
+                self.names[(kind, entity_id)] = name
+                for key, word in index_keys(name):
+                    entry = (key, word, kind, entity_id, name)
+                    if entry in removed:
+                        removed.discard(entry)
+                    else:
+                        bisect.insort(added, entry)
+
+        if len(added) + len(removed) > max(self.MERGE_MIN, len(entries) // 8):
+            entries = tuple(heapq.merge((entry for entry in entries if entry not in removed), added))
+            self.state = (tuple(entry[0] for entry in entries), entries, (), frozenset())
+        else:
+            self.state = (keys, entries, tuple(added), frozenset(removed))
@@ -0,0 +1,257 @@
+## Route level benchmark: latency percentiles, queries per request and peak memory
+##
+## Drives every route of app.py through the Flask test client against the
+## configured database (load it first with generate_data.py and flask load).
+## The write routes create, edit and delete listings of their own, removed
+## again at the end of the run:
+##
+##   python benchmark.py --requests 200 --output bench/$(git rev-parse --short HEAD).json
+##   python benchmark.py --compare bench/abc1234.json
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import quote, urlencode
+
+from app import create_app, db, delete_listings, page_cache, Artist, Show, Venue
+
+app = create_app()
+# The write routes are driven with plain form posts
+app.config['WTF_CSRF_ENABLED'] = False
+
+#----------------------------------------------------------------------------#
+# Measurements.
+#----------------------------------------------------------------------------#
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def scratch_listing(model, name, city, state, genre):
+    # Insert a listing for the write routes, returns its id
+    with app.app_context():
+        listing = model(name=name, city=city, state=state, phone='555-0100', genres=[genre])
+        db.session.add(listing)
+        db.session.commit()
+        listing_id = listing.id
+        db.session.close()
+    return listing_id
+
+def clean_up(prefix):
+    # Delete the listings named after prefix and their shows
+    with app.app_context():
+        for model in (Venue, Artist):
+            delete_listings(model, [row.id for row in db.session.query(model.id).filter(model.name.like(prefix + ' %'))])
+        db.session.close()
+
+def route_cases(prefix):
+    # (name, method, url, request options) for every route. The detail pages
+    # use the venue and artist with the most shows, the calendar and the
+    # availability search the busiest city and day of the loaded shows, the
+    # searches a common word. The write routes work on listings named after
+    # prefix, url and options are then functions called before each request.
+    with app.app_context():
+        venue_id = db.session.execute(
+            'SELECT venue_id FROM shows GROUP BY venue_id ORDER BY count(*) DESC LIMIT 1').scalar() \
+            or db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = db.session.execute(
+            'SELECT artist_id FROM shows GROUP BY artist_id ORDER BY count(*) DESC LIMIT 1').scalar() \
+            or db.session.query(db.func.min(Artist.id)).scalar()
+        busiest = db.session.execute(
+            'SELECT venues.city, venues.state, shows.start_time::date FROM shows '
+            'JOIN venues ON venues.id = shows.venue_id GROUP BY 1, 2, 3 ORDER BY count(*) DESC LIMIT 1').first()
+        genre = db.session.execute(
+            'SELECT genre FROM venues, unnest(venues.genres) AS genre GROUP BY genre ORDER BY count(*) DESC LIMIT 1').scalar()
+        last_show = db.session.query(db.func.max(Show.start_time)).scalar()
+        db.session.close()
+    city, state, day = busiest or ('San Francisco', 'CA', date.today())
+    genre = genre or 'Jazz'
+    evening = datetime.combine(day, datetime.min.time()) + timedelta(hours=20)
+    availability = urlencode({'city': city, 'start': evening.strftime('%Y-%m-%d %H:%M'),
+                              'end': (evening + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M')})
+
+    form = {'name': prefix, 'city': city, 'state': state, 'address': '1 Main Street', 'phone': '555-0100',
+            'genres': [genre], 'image_link': 'https://example.com/image.jpg',
+            'facebook_link': 'https://www.facebook.com/example', 'website_link': 'https://example.com',
+            'seeking_description': ''}
+    numbers = itertools.count(1)
+
+    def scratch(model):
+        return scratch_listing(model, '{0} {1}'.format(prefix, next(numbers)), city, state, genre)
+
+    def new_listing():
+        return {'data': dict(form, name='{0} {1}'.format(prefix, next(numbers)))}
+
+    # New shows follow each other on a venue of their own, after the last loaded show
+    show_venue_id, show_artist_id = scratch(Venue), scratch(Artist)
+    first_slot = datetime.combine((last_show or evening).date() + timedelta(days=1), datetime.min.time())
+    slots = itertools.count()
+
+    def new_show():
+        start_time = first_slot + timedelta(hours=4 * next(slots))
+        return {'data': {'venue_id': show_venue_id, 'artist_id': show_artist_id,
+                         'start_time': start_time.strftime('%Y-%m-%d %H:%M')}}
+
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_genre', 'GET', '/venues?' + urlencode({'genre': genre}), None),
+        ('search_venues', 'POST', '/venues/search', {'data': {'search_term': 'blue'}}),
+        ('show_venue', 'GET', '/venues/{0}'.format(venue_id), None),
+        ('artists', 'GET', '/artists', None),
+        ('search_artists', 'POST', '/artists/search', {'data': {'search_term': 'blue'}}),
+        ('show_artist', 'GET', '/artists/{0}'.format(artist_id), None),
+        ('shows', 'GET', '/shows', None),
+        ('shows_past', 'GET', '/shows?when=past', None),
+        ('autocomplete', 'GET', '/autocomplete?q=blu', None),
+        ('calendar', 'GET', '/calendar?date={0}'.format(day), None),
+        ('calendar_week', 'GET', '/calendar?view=week&date={0}'.format(day), None),
+        ('venue_matches', 'GET', '/venues/{0}/matches'.format(venue_id), None),
+        ('artist_matches', 'GET', '/artists/{0}/matches'.format(artist_id), None),
+        ('venue_analytics', 'GET', '/analytics/venue/{0}'.format(venue_id), None),
+        ('genre_analytics', 'GET', '/analytics/genre/{0}'.format(quote(genre)), None),
+        ('availability', 'GET', '/venues/availability?' + availability, None),
+        ('new_venue', 'GET', '/venues/create', None),
+        ('new_artist', 'GET', '/artists/create', None),
+        ('new_show', 'GET', '/shows/create', None),
+        ('edit_venue', 'GET', '/venues/{0}/edit'.format(venue_id), None),
+        ('edit_artist', 'GET', '/artists/{0}/edit'.format(artist_id), None),
+        ('api_venues', 'GET', '/api/v1/venues', None),
+        ('api_venues_genre', 'GET', '/api/v1/venues?' + urlencode({'genre': genre}), None),
+        ('api_search_venues', 'GET', '/api/v1/venues/search?q=blue', None),
+        ('api_venue', 'GET', '/api/v1/venues/{0}'.format(venue_id), None),
+        ('api_venue_matches', 'GET', '/api/v1/venues/{0}/matches'.format(venue_id), None),
+        ('api_availability', 'GET', '/api/v1/venues/availability?' + availability, None),
+        ('api_calendar', 'GET', '/api/v1/calendar?date={0}'.format(day), None),
+        ('api_analytics', 'GET', '/api/v1/analytics/city/{0}'.format(quote('{0}, {1}'.format(city, state))), None),
+        ('api_artists', 'GET', '/api/v1/artists', None),
+        ('api_search_artists', 'GET', '/api/v1/artists/search?q=blue', None),
+        ('api_artist', 'GET', '/api/v1/artists/{0}'.format(artist_id), None),
+        ('api_artist_matches', 'GET', '/api/v1/artists/{0}/matches'.format(artist_id), None),
+        ('api_shows', 'GET', '/api/v1/shows', None),
+        ('create_venue', 'POST', '/venues/create', new_listing),
+        ('create_artist', 'POST', '/artists/create', new_listing),
+        ('create_show', 'POST', '/shows/create', new_show),
+        ('update_venue', 'POST', '/venues/{0}/edit'.format(show_venue_id), {'data': dict(form, name=prefix + ' venue')}),
+        ('update_artist', 'POST', '/artists/{0}/edit'.format(show_artist_id), {'data': dict(form, name=prefix + ' artist')}),
+        ('delete_venue', 'DELETE', lambda: '/venues/{0}'.format(scratch(Venue)), None),
+        ('delete_artist', 'DELETE', lambda: '/artists/{0}'.format(scratch(Artist)), None),
+        ('api_delete_venues', 'DELETE', '/api/v1/venues', lambda: {'json': {'ids': [scratch(Venue)]}}),
+        ('api_delete_artists', 'DELETE', '/api/v1/artists', lambda: {'json': {'ids': [scratch(Artist)]}})
+    ]
+
+def resolve(value):
+    return value() if callable(value) else value
+
+def run(requests, warmup):
+    statement_count = [0]
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statement_count[0] += 1
+
+    results = {}
+    # Listings created by this run, deleted again at the end
+    prefix = 'Benchmark {0}'.format(int(time.time()))
+    cases = route_cases(prefix)
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        with app.test_client() as client:
+            for name, method, url, options in cases:
+                for _ in range(warmup):
+                    client.open(resolve(url), method=method, **(resolve(options) or {})).get_data()
+
+                timings = []
+                statements = 0
+                for _ in range(requests):
+                    # The listings a write request needs are created outside the measurement
+                    request_url, request_options = resolve(url), resolve(options) or {}
+                    counted = statement_count[0]
+                    started = time.perf_counter()
+                    response = client.open(request_url, method=method, **request_options)
+                    response.get_data()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    statements += statement_count[0] - counted
+
+                results[name] = {
+                    'url': request_url,
+                    'status': response.status_code,
+                    'p50_ms': round(percentile(timings, 0.50), 3),
+                    'p95_ms': round(percentile(timings, 0.95), 3),
+                    'p99_ms': round(percentile(timings, 0.99), 3),
+                    'mean_ms': round(statistics.mean(timings), 3),
+                    'queries_per_request': round(statements / requests, 2),
+                    'peak_rss_mb': round(peak_rss_mb(), 1)
+                }
+                print('{0:<18} p50 {p50_ms:>9.2f} ms  p95 {p95_ms:>9.2f} ms  p99 {p99_ms:>9.2f} ms  '
+                      '{queries_per_request:>6.1f} queries  {peak_rss_mb:>7.1f} MB'.format(name, **results[name]))
+    finally:
+        with app.app_context():
+            db.event.remove(db.engine, 'before_cursor_execute', count_statement)
+        clean_up(prefix)
+    return results
+
+def compare(current, previous):
+    print('\n{0:<18} {1:>12} {2:>12} {3:>8} {4:>14}'.format('route', 'p95 before', 'p95 now', 'change', 'queries'))
+    for name, result in current['routes'].items():
+        before = previous['routes'].get(name)
+        if before is None:
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        print('{0:<18} {1:>9.2f} ms {2:>9.2f} ms {3:>+7.1f}% {4:>6.1f} -> {5:<6.1f}'.format(
+            name, before['p95_ms'], result['p95_ms'], change,
+            before['queries_per_request'], result['queries_per_request']))
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every Fyyur route.')
+    parser.add_argument('--requests', type=int, default=100, help='Measured requests per route.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route.')
+    parser.add_argument('--with-cache', action='store_true', help='Keep the page cache enabled.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with.')
+    args = parser.parse_args()
+
+    # Measure the views themselves unless the cache is under test
+    page_cache.enabled = args.with_cache
+
+    current = {
+        'commit': git_commit(),
+        'requests': args.requests,
+        'page_cache': args.with_cache,
+        'routes': run(args.requests, args.warmup)
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2)
+    if args.compare:
+        with open(args.compare) as previous_file:
+            compare(current, json.load(previous_file))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+## Cache for rendered list pages with invalidation driven by database commits
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import functools
+import importlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import request, session
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# A backend only needs get / set for pages and get_counter / set_counter for
+# the tag generations (which must never be evicted), so a shared store can be
+# plugged in through the PAGE_CACHE_BACKEND setting ('module:Class')
+
+class LRUBackend:
+    # In-process, thread safe least recently used store with per entry expiry
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Counters are kept apart from the entries so they are never evicted
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self.lock:
+            expires = time.monotonic() + timeout if timeout else None
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_counter(self, key):
+        return self.counters.get(key)
+
+    def set_counter(self, key, value):
+        self.counters[key] = value
+
+
+class RedisBackend:
+    # Shared store for several worker processes, requires the redis package
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='fyyur:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, value, ex=timeout)
+
+    def get_counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else None
+
+    def set_counter(self, key, value):
+        self.client.set(self.prefix + key, value)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCache:
+    # Stores the rendered HTML of GET views under their full path. Every view
+    # is cached under one or more tags, each tag carries a generation that is
+    # part of the key, so invalidating a tag is a single write no matter how
+    # many pages (query strings, cursors) were cached for it. The generation
+    # is the time of the last change in milliseconds, which also gives the
+    # ETag / Last-Modified validators of the API for free.
+
+    def __init__(self, app=None, db=None):
+        self.backend = None
+        self.enabled = False
+        self.timeout = None
+        self.model_tags = {}
+        self.started = int(time.time() * 1000)
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.timeout = app.config.get('PAGE_CACHE_TIMEOUT', 300)
+
+        backend = app.config.get('PAGE_CACHE_BACKEND')
+        if backend is None:
+            self.backend = LRUBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 512))
+        else:
+            module_name, class_name = backend.split(':')
+            backend_class = getattr(importlib.import_module(module_name), class_name)
+            self.backend = backend_class(**app.config.get('PAGE_CACHE_BACKEND_OPTIONS', {}))
+
+        # Collect the changed model classes while flushing, invalidate once the commit went through
+        event.listen(db.session, 'after_flush', self.collect_changes)
+        event.listen(db.session, 'after_commit', self.invalidate_changes)
+        event.listen(db.session, 'after_soft_rollback', self.discard_changes)
+
+    def invalidate_on(self, model, *tags):
+        # Register the tags to invalidate whenever rows of model are committed
+        self.model_tags.setdefault(model, set()).update(tags)
+
+    def collect_changes(self, db_session, flush_context):
+        tags = db_session.info.setdefault('page_cache_tags', set())
+        for instance in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted):
+            tags.update(self.model_tags.get(type(instance), ()))
+
+    def invalidate_changes(self, db_session):
+        self.invalidate(*db_session.info.pop('page_cache_tags', ()))
+
+    def discard_changes(self, db_session, previous_transaction):
+        db_session.info.pop('page_cache_tags', None)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            # Strictly increasing even for several changes within one millisecond
+            generation = max(int(time.time() * 1000), self.generation(tag) + 1)
+            self.backend.set_counter('generation:' + tag, generation)
+        if tags:
+            self.backend.set_counter('last_write', int(time.time() * 1000))
+
+    def written_within(self, seconds):
+        # Whether a tag was invalidated in the last seconds, by any worker with
+        # a shared backend, by this process with the LRU backend
+        last_write = self.backend.get_counter('last_write')
+        return last_write is not None and time.time() * 1000 - last_write < seconds * 1000
+
+    def generation(self, tag):
+        # Tags that did not change since start up share the start up time
+        return self.backend.get_counter('generation:' + tag) or self.started
+
+    def validators(self, tags):
+        # ETag and Last-Modified time (seconds) for a resource built from tags.
+        # Responses also change without a write (shows moving from upcoming to
+        # past) and, with the per-process LRU backend, with writes made by other
+        # workers that never reach this process's generations. The validators
+        # therefore also move on every timeout seconds, the same bound the
+        # cached pages have.
+        generations = [self.generation(tag) for tag in tags]
+        period = int(time.time() // self.timeout) if self.timeout else 0
+        etag = '-'.join(str(generation) for generation in generations) + '-' + str(period) + '-' + \
+            format(zlib.crc32(request.full_path.encode('utf-8')), 'x')
+        return etag, max(max(generations) // 1000, period * (self.timeout or 0))
+
+    def make_key(self, tags):
+        generations = ','.join(str(self.generation(tag)) for tag in tags)
+        return 'page:' + generations + ':' + request.full_path
+
+    def cached(self, *tags):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pages carrying flashed messages are user specific and never cached
+                if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                key = self.make_key(tags)
+                page = self.backend.get(key)
+                if page is None:
+                    page = view(*args, **kwargs)
+                    if isinstance(page, str):
+                        self.backend.set(key, page, self.timeout)
+                return page
+            return wrapper
+        return decorator
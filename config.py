@@ -7,5 +7,120 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@127.0.0.1:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres@127.0.0.1:5432/fyyur')
+
+# Read-only views (listings, detail pages, searches, API) run on this bind when it is set
+SQLALCHEMY_BINDS = {}
+if os.environ.get('DATABASE_REPLICA_URL'):
+    SQLALCHEMY_BINDS['replica'] = os.environ['DATABASE_REPLICA_URL']
+
+# Connection pool, used for the primary and the replica
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+}
+
+# Per statement timeout of the read-only views, writes and command line jobs run without one
+READ_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))
+
+# Seconds after a write during which read-only views read from the primary
+# instead of the replica, which may lag behind
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 5))
+
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Number of hits per page for the artist and venue search
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Number of past shows per page on the venue and artist detail pages
+PAST_SHOWS_PER_PAGE = 30
+
+# Number of shows per page on the shows listing
+SHOWS_PER_PAGE = 30
+
+# Rows fetched per round trip by the server-side cursors of the streamed
+# API listings (/api/v1/venues, /api/v1/artists)
+STREAM_BATCH_SIZE = 1000
+
+# Duration in minutes of shows created or loaded without an end time
+SHOW_DEFAULT_DURATION = 180
+
+# Number of names suggested by /autocomplete by default
+AUTOCOMPLETE_RESULTS = 10
+
+# The in-memory name and match indexes are reloaded in the background once
+# older than this many seconds, which bounds how long the changes made by
+# other workers stay invisible when the page cache backend is per process
+IN_MEMORY_INDEX_MAX_AGE = 300
+
+# Maximum number of free venues returned by the availability search
+AVAILABILITY_RESULTS = 50
+
+# Number of venues suggested for an artist (and artists for a venue) by the matchmaking
+MATCH_RESULTS = 20
+
+# Similar artists shown on the artist page, and kept per artist by 'flask recommendations rebuild'
+SIMILAR_ARTISTS = 6
+SIMILAR_ARTISTS_STORED = 20
+
+# Months covered by the analytics pages by default
+ANALYTICS_MONTHS = 12
+
+# Cache of the rendered venues, artists and shows pages, invalidated on commit.
+# PAGE_CACHE_BACKEND selects a shared store ('cache:RedisBackend'), default is an in-process LRU
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 300
+PAGE_CACHE_MAX_ENTRIES = 512
+PAGE_CACHE_BACKEND = None
+
+# Per request instrumentation: Server-Timing header, debug panel on HTML pages
+# and query budgets per endpoint (exceeding one fails the request in testing mode)
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_PANEL = DEBUG
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'main.venues': 1,
+    'main.artists': 1,
+    'main.shows': 1,
+    'main.search_venues': 1,
+    'main.search_artists': 1,
+    'main.show_venue': 4,
+    'main.show_artist': 5,
+    'main.venue_availability_search': 1,
+    'main.calendar': 1,
+    'main.analytics': 1,
+    # Answered from memory, only the first lookup of a worker loads the name index
+    'main.autocomplete': 2,
+    # Answered from memory, only the first lookup of a worker loads the match index
+    'main.artist_matches': 2,
+    'main.venue_matches': 2,
+    'api.api_venues': 1,
+    'api.api_artists': 1,
+    'api.api_shows': 1,
+    'api.api_search_venues': 1,
+    'api.api_search_artists': 1,
+    'api.api_venue': 4,
+    'api.api_artist': 5,
+    'api.api_venue_availability': 1,
+    'api.api_calendar': 1,
+    'api.api_analytics': 1,
+    'api.api_artist_matches': 2,
+    'api.api_venue_matches': 2
+}
+
+# Run the independent queries of the detail pages at the same time, each on
+# its own pooled connection. Enabled by the cooperative serving mode (serve_async.py).
+# At most CONCURRENT_QUERY_WORKERS connections per process are used on top of
+# the one each request holds, requests finding none free run their queries in turn
+CONCURRENT_QUERIES = os.environ.get('CONCURRENT_QUERIES', '0') == '1'
+CONCURRENT_QUERY_WORKERS = int(os.environ.get('CONCURRENT_QUERY_WORKERS', 8))
+
+# Compiled templates are cached on disk
+JINJA_BYTECODE_CACHE_DIR = os.path.join(basedir, '.jinja_cache')
+
+# Import the lazily loaded modules and load every template in create_app(),
+# ahead of the fork with gunicorn --preload (see wsgi.py)
+WARM_UP = not DEBUG
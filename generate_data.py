@@ -0,0 +1,191 @@
+## Deterministic synthetic venues, artists and shows for load testing
+##
+## Writes venues.ndjson, artists.ndjson and shows.ndjson for the flask load command:
+##
+##   python generate_data.py --venues 4000 --artists 20000 --shows 200000 --out data
+##   flask load venues data/venues.ndjson
+##   flask load artists data/artists.ndjson
+##   flask load shows data/shows.ndjson
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+#----------------------------------------------------------------------------#
+# Distributions.
+#----------------------------------------------------------------------------#
+
+# Cities with a relative weight, a few large markets hold most of the venues
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 22), ('Chicago', 'IL', 14),
+    ('San Francisco', 'CA', 12), ('Austin', 'TX', 10), ('Nashville', 'TN', 9),
+    ('Seattle', 'WA', 7), ('Boston', 'MA', 6), ('New Orleans', 'LA', 6),
+    ('Atlanta', 'GA', 5), ('Denver', 'CO', 4), ('Portland', 'OR', 4),
+    ('Philadelphia', 'PA', 4), ('Detroit', 'MI', 3), ('Minneapolis', 'MN', 3),
+    ('Miami', 'FL', 3), ('Memphis', 'TN', 2), ('Kansas City', 'MO', 2),
+    ('Oakland', 'CA', 2), ('Boise', 'ID', 1)
+]
+
+# Genres as offered by forms.py, popular genres are drawn far more often
+GENRES = [
+    ('Rock n Roll', 20), ('Pop', 16), ('Hip-Hop', 14), ('Jazz', 10), ('Alternative', 9),
+    ('Electronic', 8), ('R&B', 7), ('Country', 6), ('Folk', 5), ('Blues', 4),
+    ('Soul', 4), ('Punk', 3), ('Heavy Metal', 3), ('Reggae', 3), ('Funk', 2),
+    ('Classical', 2), ('Instrumental', 1), ('Musical Theatre', 1), ('Other', 1)
+]
+
+NAME_WORDS = [
+    'Velvet', 'Electric', 'Blue', 'Midnight', 'Golden', 'Silver', 'Wild', 'Lonely',
+    'Crimson', 'Neon', 'Rusty', 'Hollow', 'Broken', 'Lucky', 'Northern', 'Southern',
+    'Echo', 'Thunder', 'Harbor', 'Garden', 'Parlor', 'Lantern', 'Fox', 'Sparrow',
+    'Canyon', 'River', 'Static', 'Mirror', 'Owl', 'Comet', 'Dust', 'Honey'
+]
+
+VENUE_SUFFIXES = ['Hall', 'Lounge', 'Club', 'Bar', 'Theater', 'Room', 'Tavern', 'Ballroom', 'Cafe']
+ARTIST_SUFFIXES = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project', 'Brothers', 'Sisters']
+
+#----------------------------------------------------------------------------#
+# Generators.
+#----------------------------------------------------------------------------#
+
+def weighted(rng, choices):
+    return rng.choices([value for value, weight in choices], weights=[weight for value, weight in choices])[0]
+
+def pick_city(rng):
+    city, state, weight = rng.choices(CITIES, weights=[weight for city, state, weight in CITIES])[0]
+    return city, state
+
+def pick_genres(rng):
+    # One to four distinct genres, skewed towards the popular ones
+    genres = []
+    for _ in range(rng.choice([1, 1, 2, 2, 2, 3, 4])):
+        genre = weighted(rng, GENRES)
+        if genre not in genres:
+            genres.append(genre)
+    return genres
+
+def make_name(rng, suffixes, number):
+    # The number keeps names unique, so shows can reference them by name
+    return '{0} {1} {2} {3}'.format(rng.choice(NAME_WORDS), rng.choice(NAME_WORDS), rng.choice(suffixes), number)
+
+def generate_venues(rng, count):
+    for number in range(1, count + 1):
+        city, state = pick_city(rng)
+        yield {
+            'name': make_name(rng, VENUE_SUFFIXES, number),
+            'city': city,
+            'state': state,
+            'address': '{0} {1} Street'.format(rng.randint(1, 9999), rng.choice(NAME_WORDS)),
+            'phone': '{0:03d}-{1:03d}-{2:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'website': 'https://venue{0}.example.com'.format(number),
+            'facebook_link': 'https://www.facebook.com/venue{0}'.format(number),
+            'image_link': 'https://images.example.com/venues/{0}.jpg'.format(number),
+            'genres': pick_genres(rng),
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': ''
+        }
+
+def generate_artists(rng, count):
+    for number in range(1, count + 1):
+        city, state = pick_city(rng)
+        yield {
+            'name': make_name(rng, ARTIST_SUFFIXES, number),
+            'city': city,
+            'state': state,
+            'phone': '{0:03d}-{1:03d}-{2:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'website': 'https://artist{0}.example.com'.format(number),
+            'facebook_link': 'https://www.facebook.com/artist{0}'.format(number),
+            'image_link': 'https://images.example.com/artists/{0}.jpg'.format(number),
+            'genres': pick_genres(rng),
+            'seeking_venue': rng.random() < 0.4,
+            'seeking_description': ''
+        }
+
+def generate_shows(rng, count, venue_names, artist_names, now, past_days, future_days):
+    # Popular venues and artists get most shows (Pareto skew), three quarters of
+    # the shows are in the past, start times cluster in the evening and on weekends.
+    # A venue has at most one show per evening, so no venue is double booked
+    booked = set()
+    for _ in range(count):
+        for _ in range(20):
+            venue = min(int(rng.paretovariate(1.2)), len(venue_names))
+            artist = min(int(rng.paretovariate(1.1)), len(artist_names))
+            # Spread the popular ones over the whole list instead of always the first ones
+            venue = (venue * 7919) % len(venue_names)
+            artist = (artist * 104729) % len(artist_names)
+
+            if rng.random() < 0.75:
+                day = now - timedelta(days=rng.randint(1, past_days))
+            else:
+                day = now + timedelta(days=rng.randint(1, future_days))
+            if day.weekday() < 4 and rng.random() < 0.4:
+                day += timedelta(days=4 - day.weekday())
+            if (venue, day.date()) not in booked:
+                break
+        else:
+            # Fully booked around the drawn dates, skip the show
+            continue
+        booked.add((venue, day.date()))
+
+        start_time = day.replace(hour=rng.choice([18, 19, 20, 20, 21, 21, 22, 23]),
+                                 minute=rng.choice([0, 0, 0, 30]), second=0, microsecond=0)
+        end_time = start_time + timedelta(minutes=rng.choice([90, 120, 150, 180]))
+
+        yield {
+            'venue_name': venue_names[venue],
+            'artist_name': artist_names[artist],
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat()
+        }
+
+def write_ndjson(path, rows):
+    written = 0
+    with open(path, 'w', encoding='utf-8') as output_file:
+        for row in rows:
+            output_file.write(json.dumps(row) + '\n')
+            written += 1
+    return written
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic synthetic Fyyur data.')
+    parser.add_argument('--venues', type=int, default=4000)
+    parser.add_argument('--artists', type=int, default=20000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1, help='Same seed, same data.')
+    parser.add_argument('--past-days', type=int, default=5 * 365)
+    parser.add_argument('--future-days', type=int, default=365)
+    parser.add_argument('--now', default='2026-01-01T00:00:00',
+                        help='Reference time, fixed so that runs on different days produce the same files.')
+    parser.add_argument('--out', default='data')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    now = datetime.fromisoformat(args.now)
+
+    # Separate generators per table, so changing one count does not reshuffle the others
+    venues = list(generate_venues(random.Random(args.seed), args.venues))
+    artists = list(generate_artists(random.Random(args.seed + 1), args.artists))
+    write_ndjson(os.path.join(args.out, 'venues.ndjson'), venues)
+    write_ndjson(os.path.join(args.out, 'artists.ndjson'), artists)
+
+    # Shows reference the generated names, the loader resolves them to ids
+    # Shows that cannot be placed without double booking their venue are skipped
+    shows = write_ndjson(os.path.join(args.out, 'shows.ndjson'),
+                         generate_shows(random.Random(args.seed + 2), args.shows,
+                                        [venue['name'] for venue in venues], [artist['name'] for artist in artists],
+                                        now, args.past_days, args.future_days))
+
+    print('Wrote {0} venues, {1} artists and {2} shows to {3}'.format(args.venues, args.artists, shows, args.out))
+
+if __name__ == '__main__':
+    main()
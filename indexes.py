@@ -0,0 +1,182 @@
+## Base class of the in-process indexes kept in sync with committed model changes
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Index.
+#----------------------------------------------------------------------------#
+
+class InMemoryIndex:
+    # Holds data derived from the rows of some models in memory. Subclasses
+    # implement snapshot() (the indexed values of an instance), load() (a new
+    # structure read from the database), install(loaded) and update(changes).
+    # Committed changes to the indexed models are applied incrementally
+    # through session events. Workers learn about changes made by other
+    # processes through the page cache generation of the index tag
+    # (registered with PageCache.invalidate_on for the same models) when the
+    # page cache uses a shared backend, and in any case by reloading once the
+    # index is older than IN_MEMORY_INDEX_MAX_AGE seconds.
+    #
+    # The first lookup after start up loads the index (so no connection is
+    # opened before a preload fork), concurrent first lookups wait for that
+    # one load. A stale index is reloaded on a background thread while the
+    # lookups keep answering from the current one. The lock is only held to
+    # swap the loaded structure in, the commits made during a load are
+    # recorded and applied again on top of it.
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.models = {}
+        self.generation = None
+        self.built_at = None
+        self.max_age = None
+        self.lock = threading.RLock()
+        # Serializes the first load of the index
+        self.build_lock = threading.Lock()
+        # The running background reload, None when idle
+        self.refreshing = None
+        # {(kind, id): snapshot} committed while a load runs, None when idle
+        self.pending = None
+        self.app = None
+        self.db = None
+        self.page_cache = None
+
+    def init_app(self, app, db, page_cache):
+        # Must run after page_cache.init_app, its commit listener has to move
+        # the generation on before apply_changes records it
+        self.app = app
+        self.db = db
+        self.page_cache = page_cache
+        self.max_age = app.config.get('IN_MEMORY_INDEX_MAX_AGE', 300)
+        event.listen(db.session, 'after_flush', self.collect_changes)
+        event.listen(db.session, 'after_commit', self.apply_changes)
+        event.listen(db.session, 'after_soft_rollback', self.discard_changes)
+
+    def index_model(self, model, kind):
+        # Index the rows of model, reported with kind. Commits touching model
+        # must also invalidate the tag (PageCache.invalidate_on)
+        self.models[model] = kind
+
+    def snapshot(self, instance):
+        raise NotImplementedError
+
+    def load(self):
+        # Read every indexed row into a new structure, without the lock
+        raise NotImplementedError
+
+    def install(self, loaded):
+        # Replace the current structure with a loaded one, called under the lock
+        raise NotImplementedError
+
+    def update(self, changes):
+        # Apply {(kind, id): snapshot or None for deleted}, called under the
+        # lock. Applying a change the structure already holds changes nothing.
+        raise NotImplementedError
+
+    def is_current(self):
+        # False when another process changed the models since the last
+        # load, or when the index is older than max_age
+        return self.generation == self.page_cache.generation(self.tag) and \
+            (not self.max_age or time.monotonic() - self.built_at < self.max_age)
+
+    def ensure_current(self):
+        if self.generation is None:
+            with self.build_lock:
+                if self.generation is None:
+                    self.reload()
+        elif not self.is_current():
+            self.reload_in_background()
+
+    def reload(self):
+        # Load a new structure and swap it in. Commits applied meanwhile are
+        # recorded in pending and applied again to the new structure, which
+        # may or may not have read them.
+        generation = self.page_cache.generation(self.tag)
+        with self.lock:
+            self.pending = {}
+        try:
+            loaded = self.load()
+        except:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            pending, self.pending = self.pending, None
+            self.install(loaded)
+            if pending:
+                self.update(pending)
+            self.generation = generation
+            self.built_at = time.monotonic()
+
+    def reload_in_background(self):
+        with self.lock:
+            if self.refreshing is not None:
+                return
+            self.refreshing = threading.Thread(target=self.run_reload, name=self.tag + '-index', daemon=True)
+        self.refreshing.start()
+
+    def run_reload(self):
+        # Background reload with its own app context and session
+        try:
+            with self.app.app_context():
+                try:
+                    self.reload()
+                finally:
+                    self.db.session.remove()
+        except Exception:
+            # Keep answering from the current index, the next stale lookup tries again
+            self.app.logger.exception('reloading the %s index failed', self.tag)
+        finally:
+            with self.lock:
+                self.refreshing = None
+
+    def remove(self, kind, entity_ids):
+        # Drop deleted rows, for deletes that bypass the ORM session (call it
+        # after invalidating the tag)
+        changes = {(kind, entity_id): None for entity_id in entity_ids}
+        with self.lock:
+            if self.pending is not None:
+                self.pending.update(changes)
+            if self.generation is None:
+                return
+            self.update(changes)
+            self.generation = self.page_cache.generation(self.tag)
+
+    #  Session events
+    #  ----------------------------------------------------------------
+
+    def collect_changes(self, db_session, flush_context):
+        changes = db_session.info.setdefault(self.tag + '_index_changes', {})
+        for instance in list(db_session.new) + list(db_session.dirty):
+            kind = self.models.get(type(instance))
+            if kind is not None:
+                changes[(kind, instance.id)] = self.snapshot(instance)
+        for instance in db_session.deleted:
+            kind = self.models.get(type(instance))
+            if kind is not None:
+                changes[(kind, instance.id)] = None
+
+    def apply_changes(self, db_session):
+        changes = db_session.info.pop(self.tag + '_index_changes', None)
+        if not changes:
+            return
+        with self.lock:
+            if self.pending is not None:
+                self.pending.update(changes)
+            # Nothing to update before the first lookup loaded the index
+            if self.generation is None:
+                return
+            self.update(changes)
+            # The page cache already moved the generation on for this commit,
+            # this process is current
+            self.generation = self.page_cache.generation(self.tag)
+
+    def discard_changes(self, db_session, previous_transaction):
+        db_session.info.pop(self.tag + '_index_changes', None)
@@ -0,0 +1,195 @@
+## Per request SQL and template instrumentation
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from html import escape
+
+from flask import g, has_app_context, request, Response, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+# Cumulative pool checkout wait of this process, served by the /metrics endpoint
+pool_wait_stats = {'count': 0, 'total': 0.0, 'max': 0.0}
+pool_wait_lock = threading.Lock()
+
+def record_pool_wait(elapsed):
+    with pool_wait_lock:
+        pool_wait_stats['count'] += 1
+        pool_wait_stats['total'] += elapsed
+        pool_wait_stats['max'] = max(pool_wait_stats['max'], elapsed)
+    if has_app_context():
+        metrics = g.get('request_metrics')
+        if metrics is not None:
+            with metrics['lock']:
+                metrics['pool_wait'] += elapsed
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool measuring how long a checkout waits for a free connection,
+    # select it with the poolclass engine option
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+class QueryBudgetExceeded(AssertionError):
+    # Raised in testing mode when a route runs more statements than its budget
+    pass
+
+
+class RequestMetrics:
+    # Records for every request the number of SQL statements, the time spent in
+    # the database and in rendering templates and the slowest statement. The
+    # numbers are sent as a Server-Timing header, shown in a small panel at the
+    # bottom of HTML pages in debug mode and checked against QUERY_BUDGETS.
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('INSTRUMENTATION_PANEL', app.debug)
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGET_DEFAULT', None)
+        app.config.setdefault('METRICS_ENDPOINT', True)
+
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+
+        # Listening on the Engine class covers every engine and bind of the app
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        before_render_template.connect(self.before_render_template, app)
+        template_rendered.connect(self.template_rendered, app)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+        if app.config['METRICS_ENDPOINT']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics)
+
+    #  Collection
+    #  ----------------------------------------------------------------
+
+    def start_request(self):
+        g.request_metrics = {
+            # The queries run by run_concurrently() update the metrics from several threads
+            'lock': threading.Lock(),
+            'started': time.perf_counter(),
+            'queries': 0,
+            'db_time': 0.0,
+            'pool_wait': 0.0,
+            'template_time': 0.0,
+            'template_started': None,
+            'slowest_time': 0.0,
+            'slowest_statement': None
+        }
+
+    def current(self):
+        # Queries run concurrently for a request share its metrics through g
+        if has_app_context():
+            return g.get('request_metrics')
+        return None
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+        metrics = self.current()
+        if metrics is None:
+            return
+        with metrics['lock']:
+            metrics['queries'] += 1
+            metrics['db_time'] += elapsed
+            if elapsed > metrics['slowest_time']:
+                metrics['slowest_time'] = elapsed
+                metrics['slowest_statement'] = statement
+
+    def before_render_template(self, sender, template, context, **extra):
+        metrics = self.current()
+        if metrics is not None:
+            metrics['template_started'] = time.perf_counter()
+
+    def template_rendered(self, sender, template, context, **extra):
+        metrics = self.current()
+        if metrics is not None and metrics['template_started'] is not None:
+            metrics['template_time'] += time.perf_counter() - metrics['template_started']
+            metrics['template_started'] = None
+
+    #  Reporting
+    #  ----------------------------------------------------------------
+
+    def finish_request(self, response):
+        metrics = self.current()
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics['started']
+
+        response.headers.add('Server-Timing', 'db;dur={0:.2f};desc="{1} queries", pool;dur={2:.2f}, tpl;dur={3:.2f}, total;dur={4:.2f}'.format(
+            metrics['db_time'] * 1000, metrics['queries'], metrics['pool_wait'] * 1000,
+            metrics['template_time'] * 1000, total * 1000))
+
+        if self.app.config['INSTRUMENTATION_PANEL'] and response.mimetype == 'text/html' \
+                and not response.is_streamed and response.status_code == 200:
+            self.add_panel(response, metrics, total)
+
+        self.check_budget(metrics)
+        return response
+
+    def add_panel(self, response, metrics, total):
+        panel = ('<div style="position: fixed; bottom: 0; right: 0; z-index: 9999; padding: 4px 8px; '
+                 'background: #222; color: #eee; font: 12px monospace; max-width: 60%;" '
+                 'title="{slowest}">{endpoint}: {queries} queries, db {db:.1f} ms, '
+                 'templates {tpl:.1f} ms, total {total:.1f} ms, slowest {slowest_time:.1f} ms</div>').format(
+            endpoint=escape(str(request.endpoint)),
+            queries=metrics['queries'],
+            db=metrics['db_time'] * 1000,
+            tpl=metrics['template_time'] * 1000,
+            total=total * 1000,
+            slowest_time=metrics['slowest_time'] * 1000,
+            slowest=escape(' '.join((metrics['slowest_statement'] or '').split())))
+        body = response.get_data(as_text=True)
+        if '</body>' in body:
+            response.set_data(body.replace('</body>', panel + '</body>', 1))
+
+    def metrics(self):
+        # Process wide pool checkout wait in the Prometheus text format
+        with pool_wait_lock:
+            stats = dict(pool_wait_stats)
+        lines = [
+            '# TYPE fyyur_pool_checkout_wait_seconds summary',
+            'fyyur_pool_checkout_wait_seconds_count {0}'.format(stats['count']),
+            'fyyur_pool_checkout_wait_seconds_sum {0:.6f}'.format(stats['total']),
+            '# TYPE fyyur_pool_checkout_wait_seconds_max gauge',
+            'fyyur_pool_checkout_wait_seconds_max {0:.6f}'.format(stats['max'])
+        ]
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain')
+
+    def check_budget(self, metrics):
+        budget = self.app.config['QUERY_BUDGETS'].get(request.endpoint, self.app.config['QUERY_BUDGET_DEFAULT'])
+        if budget is None or metrics['queries'] <= budget:
+            return
+        message = '{0} ran {1} queries, its budget is {2}'.format(request.endpoint, metrics['queries'], budget)
+        # Fail the test run, outside of tests only warn
+        if self.app.testing:
+            raise QueryBudgetExceeded(message)
+        self.app.logger.warning(message)
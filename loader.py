@@ -0,0 +1,208 @@
+## Streaming readers, row validation and bulk writers used by the flask load command
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import dateutil.parser
+
+#----------------------------------------------------------------------------#
+# Table layout.
+#----------------------------------------------------------------------------#
+
+# Columns written per table, any other input field is ignored
+COLUMNS = {
+    'venues': ['name', 'city', 'state', 'address', 'phone', 'website', 'image_link',
+               'facebook_link', 'genres', 'seeking_talent', 'seeking_description'],
+    'artists': ['name', 'city', 'state', 'phone', 'website', 'image_link',
+                'facebook_link', 'genres', 'seeking_venue', 'seeking_description'],
+    'shows': ['artist_id', 'venue_id', 'start_time', 'end_time']
+}
+
+REQUIRED_COLUMNS = {
+    'venues': ['name', 'city', 'state'],
+    'artists': ['name', 'city', 'state'],
+    'shows': ['start_time']
+}
+
+BOOLEAN_COLUMNS = {'seeking_talent', 'seeking_venue'}
+
+# Duration of shows given without an end_time
+DEFAULT_SHOW_DURATION = timedelta(hours=3)
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+def read_rows(path):
+    # Yield one dictionary per input row without reading the whole file,
+    # .csv files need a header line, anything else is read as NDJSON
+    with open(path, newline='', encoding='utf-8') as input_file:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(input_file):
+                yield row
+        else:
+            for line in input_file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def chunked(rows, size):
+    # Group an iterable of rows into lists of at most size rows
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def parse_boolean(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 't', 'yes', 'y'):
+        return True
+    if value in ('', '0', 'false', 'f', 'no', 'n'):
+        return False
+    raise ValueError('invalid boolean ' + repr(value))
+
+def parse_genres(value):
+    # Lists are taken as they are, CSV cells hold a JSON list or 'Jazz;Folk'
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return [str(genre).strip() for genre in value if str(genre).strip()]
+    value = str(value).strip()
+    if value.startswith('['):
+        return parse_genres(json.loads(value))
+    return [genre.strip() for genre in value.split(';') if genre.strip()]
+
+def build_reference_map(rows):
+    # Map ids and lower cased names of existing rows to ids, names shared by
+    # several rows map to None and cannot be used as a reference
+    ids = set()
+    names = {}
+    for row_id, name in rows:
+        ids.add(row_id)
+        key = (name or '').strip().lower()
+        names[key] = None if key in names else row_id
+    return {'ids': ids, 'names': names}
+
+def resolve_reference(row, kind, references):
+    # Resolve <kind>_id or <kind>_name of a show row through the in-memory map
+    reference = references[kind]
+    if not is_blank(row.get(kind + '_id')):
+        row_id = int(row[kind + '_id'])
+        if row_id not in reference['ids']:
+            raise ValueError('unknown {0} id {1}'.format(kind, row_id))
+        return row_id
+    name = (row.get(kind + '_name') or '').strip().lower()
+    if not name:
+        raise ValueError('missing {0}_id or {0}_name'.format(kind))
+    if name not in reference['names']:
+        raise ValueError('unknown {0} {1!r}'.format(kind, row[kind + '_name']))
+    if reference['names'][name] is None:
+        raise ValueError('ambiguous {0} name {1!r}, use {0}_id'.format(kind, row[kind + '_name']))
+    return reference['names'][name]
+
+def parse_datetime(value):
+    # Show times are stored without a time zone in the server's local time,
+    # input with an offset ('2035-04-01T21:00Z', '...+02:00') is converted to
+    # it, so the COPY and the INSERT path store the same time as the show form
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+def clean_row(table, row, references=None, show_duration=DEFAULT_SHOW_DURATION):
+    # Return the row restricted to the table columns with converted values,
+    # raises ValueError with a readable message for invalid rows. Blank text
+    # is stored as NULL by both write paths (COPY reads an empty CSV field as NULL).
+    for column in REQUIRED_COLUMNS[table]:
+        if is_blank(row.get(column)):
+            raise ValueError('missing ' + column)
+
+    if table == 'shows':
+        start_time = parse_datetime(row['start_time'])
+        if is_blank(row.get('end_time')):
+            end_time = start_time + show_duration
+        else:
+            end_time = parse_datetime(row['end_time'])
+            if end_time < start_time:
+                raise ValueError('end_time before start_time')
+        return {
+            'artist_id': resolve_reference(row, 'artist', references),
+            'venue_id': resolve_reference(row, 'venue', references),
+            'start_time': start_time,
+            'end_time': end_time
+        }
+
+    cleaned = {}
+    for column in COLUMNS[table]:
+        value = row.get(column)
+        if column == 'genres':
+            value = parse_genres(value)
+        elif column in BOOLEAN_COLUMNS:
+            value = parse_boolean(value)
+        elif value is not None:
+            value = str(value).strip() or None
+        cleaned[column] = value
+    return cleaned
+
+def validate_chunk(table, chunk, first_row_number, references=None, show_duration=DEFAULT_SHOW_DURATION):
+    # Split a chunk into cleaned rows and (row number, message) errors
+    rows = []
+    errors = []
+    for offset, row in enumerate(chunk):
+        try:
+            rows.append(clean_row(table, row, references, show_duration))
+        except (ValueError, TypeError, OverflowError) as error:
+            errors.append((first_row_number + offset, str(error)))
+    return rows, errors
+
+#----------------------------------------------------------------------------#
+# Writing.
+#----------------------------------------------------------------------------#
+
+def copy_value(value):
+    # Text representation of a value in a COPY ... (FORMAT csv) stream
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def copy_rows(dbapi_connection, table, rows):
+    # Write rows with a single COPY FROM STDIN, the fastest path on Postgres
+    columns = COLUMNS[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = dbapi_connection.cursor()
+    cursor.copy_expert('COPY {0} ({1}) FROM STDIN WITH (FORMAT csv)'.format(table, ', '.join(columns)), buffer)
+    cursor.close()
+
+def insert_rows(connection, table_object, rows):
+    # Write rows with one executemany INSERT, works on any database
+    connection.execute(table_object.insert(), rows)
@@ -0,0 +1,148 @@
+## Artist - venue matchmaking over in-memory inverted indexes of genres and cities
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import heapq
+from collections import Counter, namedtuple
+
+from indexes import InMemoryIndex
+
+#----------------------------------------------------------------------------#
+# Scoring.
+#----------------------------------------------------------------------------#
+
+# Points per shared genre, for the same city and for a counterpart that is
+# looking (a venue seeking talent, an artist seeking a venue)
+GENRE_WEIGHT = 3
+CITY_WEIGHT = 4
+SEEKING_WEIGHT = 2
+
+# The model column holding the seeking flag, per kind
+SEEKING_COLUMNS = {'venue': 'seeking_talent', 'artist': 'seeking_venue'}
+
+COUNTERPARTS = {'venue': 'artist', 'artist': 'venue'}
+
+Profile = namedtuple('Profile', ['name', 'genres', 'city', 'state', 'seeking'])
+
+def city_key(city, state):
+    return ((city or '').strip().lower(), (state or '').strip().upper())
+
+def add_profile(profiles, genres, cities, kind, entity_id, profile):
+    # Enter a profile into the profile dictionary and both inverted indexes
+    profiles[kind][entity_id] = profile
+    for genre in profile.genres:
+        genres[kind].setdefault(genre, set()).add(entity_id)
+    cities[kind].setdefault(city_key(profile.city, profile.state), set()).add(entity_id)
+
+#----------------------------------------------------------------------------#
+# Index.
+#----------------------------------------------------------------------------#
+
+class MatchIndex(InMemoryIndex):
+    # Profiles of all venues and artists with two inverted indexes per kind:
+    # genre -> ids and (city, state) -> ids. Ranking the counterparts of one
+    # venue or artist only visits the ids listed under its genres and its
+    # city, counted with Counter.update, so a query over 100k rows takes
+    # milliseconds without touching the database. The dictionaries and sets
+    # are changed in place by update() and replaced by install(), every read
+    # and write holds the lock.
+
+    def __init__(self, tag='matches'):
+        super().__init__(tag)
+        self.profiles = {kind: {} for kind in COUNTERPARTS}
+        self.genres = {kind: {} for kind in COUNTERPARTS}
+        self.cities = {kind: {} for kind in COUNTERPARTS}
+
+    def init_app(self, app, db, page_cache):
+        super().init_app(app, db, page_cache)
+        app.config.setdefault('MATCH_RESULTS', 20)
+
+    #  Lookup
+    #  ----------------------------------------------------------------
+
+    def profile(self, kind, entity_id):
+        # The indexed Profile of a venue or artist, None when the id is unknown
+        self.ensure_current()
+        with self.lock:
+            return self.profiles[kind].get(entity_id)
+
+    def matches(self, kind, entity_id, limit=20):
+        # The best limit counterparts of the venue (kind='venue') or artist,
+        # best first, None when the id is unknown. A counterpart needs a shared
+        # genre or the same city to be considered at all.
+        self.ensure_current()
+        counterpart = COUNTERPARTS[kind]
+        with self.lock:
+            profile = self.profiles[kind].get(entity_id)
+            if profile is None:
+                return None
+
+            shared_genres = Counter()
+            for genre in profile.genres:
+                shared_genres.update(self.genres[counterpart].get(genre, ()))
+            same_city = self.cities[counterpart].get(city_key(profile.city, profile.state), set())
+            candidates = self.profiles[counterpart]
+
+            def score(candidate_id):
+                return shared_genres[candidate_id] * GENRE_WEIGHT + \
+                    (CITY_WEIGHT if candidate_id in same_city else 0) + \
+                    (SEEKING_WEIGHT if candidates[candidate_id].seeking else 0)
+
+            # Ties go to the lower (older) id, so the order is stable
+            best = heapq.nlargest(limit, set(shared_genres) | same_city,
+                                  key=lambda candidate_id: (score(candidate_id), -candidate_id))
+
+            return [{
+                "type": counterpart,
+                "id": candidate_id,
+                "name": candidates[candidate_id].name,
+                "city": candidates[candidate_id].city,
+                "state": candidates[candidate_id].state,
+                "shared_genres": sorted(profile.genres & candidates[candidate_id].genres),
+                "same_city": candidate_id in same_city,
+                "seeking": candidates[candidate_id].seeking,
+                "score": score(candidate_id)
+            } for candidate_id in best]
+
+    #  Maintenance
+    #  ----------------------------------------------------------------
+
+    def snapshot(self, instance):
+        kind = self.models[type(instance)]
+        return Profile(instance.name, frozenset(instance.genres or ()), instance.city, instance.state,
+                       bool(getattr(instance, SEEKING_COLUMNS[kind])))
+
+    def load(self):
+        # Every profile with one query per indexed model, indexed into new
+        # (profiles, genres, cities) dictionaries
+        profiles, genres, cities = loaded = tuple({kind: {} for kind in COUNTERPARTS} for _ in range(3))
+        for model, kind in self.models.items():
+            query = self.db.session.query(model.id, model.name, model.genres, model.city, model.state,
+                                          getattr(model, SEEKING_COLUMNS[kind]))
+            for entity_id, name, entity_genres, city, state, seeking in query:
+                add_profile(profiles, genres, cities, kind, entity_id,
+                            Profile(name, frozenset(entity_genres or ()), city, state, bool(seeking)))
+        return loaded
+
+    def install(self, loaded):
+        self.profiles, self.genres, self.cities = loaded
+
+    def update(self, changes):
+        # Apply {(kind, id): Profile or None for deleted}, called under the lock
+        for (kind, entity_id), profile in changes.items():
+            self.discard(kind, entity_id)
+            if profile is not None:
+                self.add(kind, entity_id, profile)
+
+    def add(self, kind, entity_id, profile):
+        add_profile(self.profiles, self.genres, self.cities, kind, entity_id, profile)
+
+    def discard(self, kind, entity_id):
+        profile = self.profiles[kind].pop(entity_id, None)
+        if profile is None:
+            return
+        for genre in profile.genres:
+            self.genres[kind].get(genre, set()).discard(entity_id)
+        self.cities[kind].get(city_key(profile.city, profile.state), set()).discard(entity_id)
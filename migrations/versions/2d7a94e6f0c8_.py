@@ -0,0 +1,30 @@
+"""add composite indexes on the shows table
+
+Revision ID: 2d7a94e6f0c8
+Revises: c51e0a8f2b96
+Create Date: 2026-10-18 10:41:55.093000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7a94e6f0c8'
+down_revision = 'c51e0a8f2b96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per venue / per artist show lookups, with the start_time > now split served by the same index
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+    # Time window listings and the (start_time, id) keyset pagination of /shows
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
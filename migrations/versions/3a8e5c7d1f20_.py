@@ -0,0 +1,53 @@
+"""add show end times and prevent double booking of venues
+
+Revision ID: 3a8e5c7d1f20
+Revises: 7f3c2b9d4e15
+Create Date: 2026-10-18 14:05:12.406000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8e5c7d1f20'
+down_revision = '7f3c2b9d4e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist provides the = operator on integers inside a GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    # Existing shows last three hours (SHOW_DEFAULT_DURATION), cut short where
+    # the next show of the venue starts earlier. Shows double booked at the very
+    # same time end up with an empty period and are kept as they are.
+    op.execute("""
+        UPDATE shows SET end_time = least(shows.start_time + interval '3 hours', following.next_start_time)
+        FROM (SELECT id, lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_start_time
+              FROM shows) AS following
+        WHERE shows.id = following.id
+    """)
+    op.alter_column('shows', 'start_time', existing_type=sa.DateTime(), nullable=False)
+    op.alter_column('shows', 'end_time', existing_type=sa.DateTime(), nullable=False)
+    op.create_check_constraint('ck_shows_end_time', 'shows', 'end_time >= start_time')
+
+    # The [start_time, end_time) periods of the shows of a venue must not overlap,
+    # the GiST index behind the constraint also serves the availability search
+    op.execute("""
+        ALTER TABLE shows ADD CONSTRAINT ex_shows_venue_id_period
+        EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)
+    """)
+
+    op.create_index('ix_venues_city_state', 'venues', ['city', 'state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venues_city_state', table_name='venues')
+    op.drop_constraint('ex_shows_venue_id_period', 'shows')
+    op.drop_constraint('ck_shows_end_time', 'shows')
+    op.alter_column('shows', 'start_time', existing_type=sa.DateTime(), nullable=True)
+    op.drop_column('shows', 'end_time')
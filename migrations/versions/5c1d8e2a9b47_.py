@@ -0,0 +1,31 @@
+"""delete the shows of a venue or artist together with it (ON DELETE CASCADE)
+
+Revision ID: 5c1d8e2a9b47
+Revises: 3a8e5c7d1f20
+Create Date: 2026-10-18 15:32:47.120000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d8e2a9b47'
+down_revision = '3a8e5c7d1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The constraints were created unnamed, these are the names Postgres gave them
+    op.drop_constraint('shows_artist_id_fkey', 'shows', type_='foreignkey')
+    op.drop_constraint('shows_venue_id_fkey', 'shows', type_='foreignkey')
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'artists', ['artist_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('shows_venue_id_fkey', 'shows', type_='foreignkey')
+    op.drop_constraint('shows_artist_id_fkey', 'shows', type_='foreignkey')
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'artists', ['artist_id'], ['id'])
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'])
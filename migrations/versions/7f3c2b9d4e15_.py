@@ -0,0 +1,55 @@
+"""add maintained upcoming / past show counters to venues and artists
+
+Revision ID: 7f3c2b9d4e15
+Revises: 2d7a94e6f0c8
+Create Date: 2026-10-18 12:20:36.718000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3c2b9d4e15'
+down_revision = '2d7a94e6f0c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('show_counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Initial fill, same statement as 'flask counters rebuild'. Show times are
+    # the server's local time, the database session's time zone may differ,
+    # so now() is not used
+    now = datetime.now()
+    connection = op.get_bind()
+    for table, column in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        connection.execute(sa.text("""
+            UPDATE {table} SET upcoming_shows_count = coalesce(counted.upcoming, 0),
+                               past_shows_count = coalesce(counted.past, 0)
+            FROM {table} AS entity
+            LEFT JOIN (SELECT {column},
+                              count(*) FILTER (WHERE start_time > :now) AS upcoming,
+                              count(*) FILTER (WHERE start_time <= :now) AS past
+                       FROM shows GROUP BY {column}) AS counted ON counted.{column} = entity.id
+            WHERE {table}.id = entity.id
+        """.format(table=table, column=column)), now=now)
+    connection.execute(sa.text("INSERT INTO show_counter_state (id, rolled_at) VALUES (1, :now)"), now=now)
+
+
+def downgrade():
+    op.drop_table('show_counter_state')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,38 @@
+"""add trigram and full-text search indexes on artist and venue names
+
+Revision ID: 9b2f6c1d7a34
+Revises: 4e15b5a238e1
+Create Date: 2026-10-18 09:12:41.204000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f6c1d7a34'
+down_revision = '4e15b5a238e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram operators are needed for indexed ilike '%term%' lookups and similarity ranking
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    # Full-text indexes over the names, matching the to_tsvector('simple', name) expression used in app.py
+    op.execute("CREATE INDEX ix_artists_name_tsv ON artists USING gin (to_tsvector('simple', coalesce(name, '')))")
+    op.execute("CREATE INDEX ix_venues_name_tsv ON venues USING gin (to_tsvector('simple', coalesce(name, '')))")
+
+
+def downgrade():
+    op.drop_index('ix_venues_name_tsv', table_name='venues')
+    op.drop_index('ix_artists_name_tsv', table_name='artists')
+    op.drop_index('ix_venues_name_trgm', table_name='venues')
+    op.drop_index('ix_artists_name_trgm', table_name='artists')
+    # The pg_trgm extension is left installed since other databases objects may rely on it
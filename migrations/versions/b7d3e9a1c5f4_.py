@@ -0,0 +1,65 @@
+"""add the daily and monthly show rollups for the analytics pages
+
+Revision ID: b7d3e9a1c5f4
+Revises: e8b4d2f6a913
+Create Date: 2026-10-18 19:02:41.277000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9a1c5f4'
+down_revision = 'e8b4d2f6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('show_daily_rollups',
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=250), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('shows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'key', 'day')
+    )
+    op.create_table('show_monthly_rollups',
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=250), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.Column('shows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'key', 'month', 'genre')
+    )
+
+    # Initial fill, same rows as 'flask analytics rebuild'
+    op.execute("""
+        WITH counted AS (
+            SELECT shows.start_time::date AS day, shows.venue_id, shows.artist_id, artists.genres,
+                   coalesce(venues.city, '') || ', ' || coalesce(venues.state, '') AS city
+            FROM shows
+            JOIN venues ON venues.id = shows.venue_id
+            JOIN artists ON artists.id = shows.artist_id
+        ), keyed AS (
+            SELECT keys.dimension, keys.key, counted.day, counted.genres
+            FROM counted CROSS JOIN LATERAL (VALUES ('venue', counted.venue_id::text),
+                                                    ('artist', counted.artist_id::text),
+                                                    ('city', counted.city)) AS keys (dimension, key)
+            UNION ALL
+            SELECT 'genre', genre, counted.day, '{}'::varchar[]
+            FROM counted CROSS JOIN LATERAL unnest(counted.genres) AS genre
+        ), daily AS (
+            INSERT INTO show_daily_rollups (dimension, key, day, shows)
+            SELECT dimension, key, day, count(*) FROM keyed GROUP BY dimension, key, day
+        )
+        INSERT INTO show_monthly_rollups (dimension, key, month, genre, shows)
+        SELECT keyed.dimension, keyed.key, date_trunc('month', keyed.day)::date AS month, mix.genre, count(*)
+        FROM keyed CROSS JOIN LATERAL (SELECT '' UNION ALL SELECT unnest(keyed.genres)) AS mix (genre)
+        GROUP BY keyed.dimension, keyed.key, month, mix.genre
+    """)
+
+
+def downgrade():
+    op.drop_table('show_monthly_rollups')
+    op.drop_table('show_daily_rollups')
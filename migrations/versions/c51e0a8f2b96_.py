@@ -0,0 +1,97 @@
+"""store artist and venue genres as indexed text arrays
+
+Revision ID: c51e0a8f2b96
+Revises: 9b2f6c1d7a34
+Create Date: 2026-10-18 10:03:17.551000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c51e0a8f2b96'
+down_revision = '9b2f6c1d7a34'
+branch_labels = None
+depends_on = None
+
+# Number of rows converted per UPDATE statement, each batch is committed on its own
+BATCH_SIZE = 5000
+
+# The old String column holds either the Postgres array literal produced by
+# assigning a list ('{Jazz,"Rock n Roll"}') or a plain comma separated string,
+# whose genres are trimmed ('Jazz, Blues' -> {Jazz,Blues}). {column} is the
+# column read, genres or NEW.genres in the trigger.
+TO_ARRAY = """
+    CASE
+        WHEN {column} IS NULL OR {column} = '' THEN '{{}}'::varchar(120)[]
+        WHEN {column} LIKE '{{%}}' THEN {column}::varchar(120)[]
+        ELSE ARRAY(SELECT btrim(split.genre)
+                   FROM unnest(string_to_array({column}, ',')) WITH ORDINALITY AS split(genre, position)
+                   WHERE btrim(split.genre) <> ''
+                   ORDER BY split.position)::varchar(120)[]
+    END
+"""
+
+TO_STRING = '{column}::varchar(120)'
+
+
+def add_converted_column(table, source, target, column, expression):
+    # Add target next to source and fill it with expression without locking
+    # the table for the whole conversion. Adding the column only changes the
+    # catalog, and a trigger converts the rows written from then on. That
+    # transaction is committed, the existing rows are then converted in
+    # batches of BATCH_SIZE ids, each committed on its own. The caller swaps
+    # the columns afterwards with drop_converted_column.
+    op.add_column(table, column)
+    op.execute("""
+        CREATE FUNCTION {table}_{target}_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.{target} := {expression};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(table=table, target=target, expression=expression.format(column='NEW.' + source)))
+    op.execute('CREATE TRIGGER {table}_{target}_sync BEFORE INSERT OR UPDATE OF {source} ON {table} '
+               'FOR EACH ROW EXECUTE PROCEDURE {table}_{target}_sync()'.format(table=table, source=source, target=target))
+
+    # Commits the migration transaction so far (the new column and trigger included)
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        low, high = connection.execute(sa.text('SELECT min(id), max(id) FROM ' + table)).fetchone()
+        if low is None:
+            return
+        for start in range(low, high + 1, BATCH_SIZE):
+            connection.execute(
+                sa.text('UPDATE {0} SET {1} = {2} WHERE id >= :start AND id < :stop'.format(
+                    table, target, expression.format(column=source))),
+                start=start, stop=start + BATCH_SIZE)
+
+
+def drop_converted_column(table, source, target):
+    # Replace source with the converted target column
+    op.execute('DROP TRIGGER {0}_{1}_sync ON {0}'.format(table, target))
+    op.execute('DROP FUNCTION {0}_{1}_sync()'.format(table, target))
+    op.drop_column(table, source)
+    op.alter_column(table, target, new_column_name=source)
+
+
+def upgrade():
+    for table in ('artists', 'venues'):
+        add_converted_column(table, 'genres', 'genres_array',
+                             sa.Column('genres_array', postgresql.ARRAY(sa.String(length=120)),
+                                       nullable=False, server_default='{}'),
+                             TO_ARRAY)
+        drop_converted_column(table, 'genres', 'genres_array')
+        op.create_index('ix_{0}_genres'.format(table), table, ['genres'], unique=False,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_index('ix_{0}_genres'.format(table), table_name=table)
+        add_converted_column(table, 'genres', 'genres_string',
+                             sa.Column('genres_string', sa.String(length=120), nullable=True),
+                             TO_STRING)
+        drop_converted_column(table, 'genres', 'genres_string')
@@ -0,0 +1,36 @@
+"""add the precomputed similar artists table
+
+Revision ID: e8b4d2f6a913
+Revises: 5c1d8e2a9b47
+Create Date: 2026-10-18 17:48:03.512000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4d2f6a913'
+down_revision = '5c1d8e2a9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by 'flask recommendations rebuild'
+    op.create_table('similar_artists',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.Column('similar_artist_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('shared_venues', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'rank')
+    )
+    op.create_index('ix_similar_artists_similar_artist_id', 'similar_artists', ['similar_artist_id'])
+
+
+def downgrade():
+    op.drop_index('ix_similar_artists_similar_artist_id', table_name='similar_artists')
+    op.drop_table('similar_artists')
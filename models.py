@@ -1,13 +1,60 @@
-## Create database models with appropriate parent-child relations
+## Database models, shared by the app, the migrations and the command line tools
 
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask_sqlalchemy import SQLAlchemy
+import functools
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
 from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
+
+#----------------------------------------------------------------------------#
+# Database.
+#----------------------------------------------------------------------------#
 
-db = SQLAlchemy()
+# Session sending the queries of read-only views to the replica bind, if one
+# is configured. Requests shortly after a write (g.recent_write, see app.py)
+# read from the primary instead, the replica may not have the write yet.
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_app_context() and g.get('read_only') and not g.get('recent_write') \
+                and 'replica' in (self.app.config.get('SQLALCHEMY_BINDS') or {}):
+            return self.db.get_engine(self.app, bind='replica')
+        return super().get_bind(mapper=mapper, clause=clause)
+
+@event.listens_for(RoutingSession, 'after_begin')
+def limit_read_only_statements(db_session, transaction, connection):
+    # Statements of read-only views are cancelled after READ_STATEMENT_TIMEOUT_MS.
+    # Writes and the command line jobs (load, rebuilds) run without a limit.
+    # SET LOCAL ends with the transaction, the raw cursor keeps it out of the
+    # request metrics and query budgets.
+    timeout = db_session.app.config.get('READ_STATEMENT_TIMEOUT_MS')
+    if timeout and has_app_context() and g.get('read_only'):
+        cursor = connection.connection.cursor()
+        cursor.execute('SET LOCAL statement_timeout = {0:d}'.format(int(timeout)))
+        cursor.close()
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+def read_only(view):
+    # Mark a view as read-only, its queries then run on the replica
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+# Bound to the app by create_app() in app.py
+db = RoutingSQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -24,11 +71,22 @@ class Artist(db.Model):
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(120)), nullable=False, server_default='{}')
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean())
     seeking_description = db.Column(db.String(500))
+
+    # Denormalized show counters, see the Show counters section of app.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Trigram index backing the name search (see migration 9b2f6c1d7a34)
+    # and GIN index backing the genre filter (see migration c51e0a8f2b96)
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+    )
     
     # Realize the many-to-many relation via association proxy
     show = association_proxy("shows", "venues")
@@ -45,7 +103,7 @@ class Venue(db.Model):
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(120)), nullable=False, server_default='{}')
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
@@ -54,6 +112,19 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean())
     seeking_description = db.Column(db.String(500))
 
+    # Denormalized show counters, see the Show counters section of app.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Trigram index backing the name search (see migration 9b2f6c1d7a34),
+    # GIN index backing the genre filter (see migration c51e0a8f2b96)
+    # and city / state index backing the availability search (see migration 3a8e5c7d1f20)
+    __table_args__ = (
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venues_city_state', 'city', 'state'),
+    )
+
     # Realize the many-to-many relation via association proxy
     artist = association_proxy("shows", "artist")
 
@@ -66,14 +137,88 @@ class Show(db.Model):
     __tablename__ = 'shows'
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
-    start_time = db.Column(db.DateTime())
-
-    artist = db.relationship(Artist, backref="shows")
-    venue = db.relationship(Venue, backref="shows")
+    # The database deletes the shows of a deleted venue or artist (see migration 5c1d8e2a9b47)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'))
+    start_time = db.Column(db.DateTime(), nullable=False)
+    end_time = db.Column(db.DateTime(), nullable=False)
+
+    # Indexes for the per venue / per artist show lookups and the time window listings (see migration 2d7a94e6f0c8).
+    # A venue cannot be booked twice at the same time: the [start_time, end_time)
+    # periods of its shows must not overlap (GiST exclusion constraint, see
+    # migration 3a8e5c7d1f20), its index also answers the availability search
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint('end_time >= start_time', name='ck_shows_end_time'),
+        ExcludeConstraint((venue_id, '='), (db.func.tsrange(start_time, end_time), '&&'),
+                          name='ex_shows_venue_id_period', using='gist'),
+    )
+
+    # passive_deletes leaves the shows to the cascade instead of loading them on delete
+    artist = db.relationship(Artist, backref=db.backref("shows", passive_deletes=True))
+    venue = db.relationship(Venue, backref=db.backref("shows", passive_deletes=True))
 
     def __repr__(self):
         return f'<Show id: {self.id}, Artist id: {self.artist_id}, Venue id: {self.venue_id}, Show starttime: {self.start_time}>'
 
+# Precomputed top similar artists of every artist (artists playing the same
+# venues), replaced as a whole by 'flask recommendations rebuild' (see similarity.py)
+
+class SimilarArtist(db.Model):
+    __tablename__ = 'similar_artists'
+
+    # The primary key (artist_id, rank) answers the detail page lookup in order
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)
+    similar_artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    shared_venues = db.Column(db.Integer, nullable=False)
+
+    # Backs the cascade when the similar artist is deleted
+    __table_args__ = (
+        db.Index('ix_similar_artists_similar_artist_id', 'similar_artist_id'),
+    )
+
+    def __repr__(self):
+        return f'<SimilarArtist artist id: {self.artist_id}, rank: {self.rank}, similar artist id: {self.similar_artist_id}>'
+
+# Show counts per day and per month of every venue, artist, city ('City, ST')
+# and genre (of the artists), maintained with the shows (see the Analytics
+# rollups section of app.py). The monthly rows also split the count by genre,
+# genre '' holds the total.
+
+class ShowDailyRollup(db.Model):
+    __tablename__ = 'show_daily_rollups'
+
+    dimension = db.Column(db.String(10), primary_key=True)
+    key = db.Column(db.String(250), primary_key=True)
+    day = db.Column(db.Date(), primary_key=True)
+    shows = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ShowDailyRollup {self.dimension} {self.key} {self.day}: {self.shows}>'
+
+class ShowMonthlyRollup(db.Model):
+    __tablename__ = 'show_monthly_rollups'
+
+    dimension = db.Column(db.String(10), primary_key=True)
+    key = db.Column(db.String(250), primary_key=True)
+    month = db.Column(db.Date(), primary_key=True)
+    genre = db.Column(db.String(120), primary_key=True)
+    shows = db.Column(db.Integer, nullable=False)
 
+    def __repr__(self):
+        return f'<ShowMonthlyRollup {self.dimension} {self.key} {self.month} {self.genre}: {self.shows}>'
+
+# Single row table holding the time up to which the show counters have been rolled forward
+
+class ShowCounterState(db.Model):
+    __tablename__ = 'show_counter_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime(), nullable=False)
+
+    def __repr__(self):
+        return f'<ShowCounterState rolled_at: {self.rolled_at}>'
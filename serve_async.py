@@ -0,0 +1,30 @@
+## Cooperative (non-blocking) serving mode
+##
+## Patches the standard library and psycopg2 for gevent before the app is
+## imported, so a worker waiting on the database yields to other requests
+## instead of holding an OS thread, and the independent queries of the
+## detail pages run concurrently. Templates, URLs and views stay the same:
+##
+##   DB_POOL_SIZE=40 gunicorn -k gevent --worker-connections 40 serve_async:app
+##
+## Every request being served holds one pooled connection and the detail
+## pages borrow up to CONCURRENT_QUERY_WORKERS more per process, so keep
+## --worker-connections + CONCURRENT_QUERY_WORKERS within DB_POOL_SIZE +
+## DB_MAX_OVERFLOW, or requests wait for a connection and time out.
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from app import create_app
+
+app = create_app()
+
+# The query pool threads are greenlets now, running queries side by side is cheap
+app.config['CONCURRENT_QUERIES'] = True
@@ -0,0 +1,109 @@
+## Similar artists from venue co-occurrence, computed in bulk with NumPy / SciPy
+##
+## Only the batch job ('flask recommendations rebuild') imports this module,
+## the web workers read the precomputed similar_artists table.
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+
+import numpy as np
+from scipy import sparse
+
+#----------------------------------------------------------------------------#
+# Similarity.
+#----------------------------------------------------------------------------#
+
+COLUMNS = ['artist_id', 'rank', 'similar_artist_id', 'score', 'shared_venues']
+
+def artist_venue_matrix(pairs):
+    # (artist ids, binary sparse matrix artist x venue) from distinct
+    # (artist_id, venue_id) pairs, one row per artist that played anywhere
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    artist_ids, artist_rows = np.unique(pairs[:, 0], return_inverse=True)
+    venue_ids, venue_columns = np.unique(pairs[:, 1], return_inverse=True)
+    played = sparse.csr_matrix((np.ones(len(pairs), dtype=np.float32), (artist_rows, venue_columns)),
+                               shape=(len(artist_ids), len(venue_ids)))
+    # Duplicate pairs would add up, an artist either played a venue or not
+    played.data[:] = 1
+    return artist_ids, played
+
+def top_similar_artists(pairs, top_k=10, block_size=2048):
+    # Yield (artist_id, rank, similar_artist_id, score, shared_venues) for the
+    # top_k most similar artists of every artist, rank 1 being the closest.
+    # The score is the cosine similarity of the venue vectors, where a venue
+    # counts less the more artists play it (idf weighting), so a shared small
+    # club says more than a shared festival ground. The products with all
+    # other artists are computed for block_size artists at a time, which
+    # bounds the memory of the intermediate sparse matrices.
+    artist_ids, played = artist_venue_matrix(pairs)
+    if not len(artist_ids):
+        return
+
+    artists_per_venue = np.asarray(played.sum(axis=0)).ravel()
+    # log1p keeps the weight of a venue every artist played above zero
+    weights = sparse.diags(np.log1p(len(artist_ids) / artists_per_venue).astype(np.float32))
+    weighted = (played @ weights).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    weighted = (sparse.diags(1 / norms) @ weighted).tocsr()
+
+    played_transposed = played.T.tocsr()
+    weighted_transposed = weighted.T.tocsr()
+
+    for block_start in range(0, len(artist_ids), block_size):
+        block_end = min(block_start + block_size, len(artist_ids))
+        scores = (weighted[block_start:block_end] @ weighted_transposed).tocsr()
+        shared = (played[block_start:block_end] @ played_transposed).tocsr()
+        scores.sort_indices()
+        shared.sort_indices()
+        # Both products have a nonzero exactly where two artists share a venue,
+        # so their data arrays line up
+        if not (np.array_equal(scores.indptr, shared.indptr) and np.array_equal(scores.indices, shared.indices)):
+            raise ValueError('similarity and shared venue matrices differ in structure')
+
+        for row in range(block_end - block_start):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            columns = scores.indices[start:end]
+            others = columns != block_start + row
+            columns = columns[others]
+            row_scores = scores.data[start:end][others]
+            row_shared = shared.data[start:end][others]
+            if len(columns) > top_k:
+                best = np.argpartition(-row_scores, top_k)[:top_k]
+                columns, row_scores, row_shared = columns[best], row_scores[best], row_shared[best]
+            # Best score first, ties to the lower artist id
+            order = np.lexsort((artist_ids[columns], -row_scores))
+            artist_id = int(artist_ids[block_start + row])
+            for rank, position in enumerate(order, 1):
+                yield (artist_id, rank, int(artist_ids[columns[position]]),
+                       round(float(row_scores[position]), 6), int(round(row_shared[position])))
+
+#----------------------------------------------------------------------------#
+# Writing.
+#----------------------------------------------------------------------------#
+
+def copy_similar_artists(dbapi_connection, rows, chunk_size=50000):
+    # Write rows with COPY FROM STDIN, chunk_size rows per statement. Returns the row count.
+    rows = iter(rows)
+    written = 0
+    cursor = dbapi_connection.cursor()
+    try:
+        while True:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            count = 0
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+                if count == chunk_size:
+                    break
+            if not count:
+                return written
+            buffer.seek(0)
+            cursor.copy_expert('COPY similar_artists ({0}) FROM STDIN WITH (FORMAT csv)'.format(', '.join(COLUMNS)), buffer)
+            written += count
+    finally:
+        cursor.close()
@@ -0,0 +1,168 @@
+## Startup benchmark: import time, first request latency and per-worker memory
+##
+## Every measurement starts a fresh interpreter or forks one, so the app must
+## not be imported by this script itself. The routes used need no database:
+##
+##   python startup_benchmark.py --workers 4 --output bench/startup-$(git rev-parse --short HEAD).json
+##
+## 'cold' builds the app with create_app() only, 'warm' also runs warm_up()
+## (what WARM_UP does ahead of the fork with gunicorn --preload). The worker
+## memory comparison forks workers from a warmed master (preload) or lets every
+## worker build its own app after the fork (no preload) and reads their
+## proportional (PSS) and private memory from /proc.
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+
+#----------------------------------------------------------------------------#
+# Measurements.
+#----------------------------------------------------------------------------#
+
+# Pages rendered without touching the database
+ROUTES = ['/', '/venues/create', '/artists/create', '/shows/create']
+
+# Runs in a fresh interpreter, prints the timings of one start as JSON
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import config
+config.WARM_UP = False
+import app as application
+imported = time.perf_counter()
+flask_app = application.create_app()
+if sys.argv[1] == 'warm':
+    application.warm_up(flask_app)
+created = time.perf_counter()
+with flask_app.test_client() as client:
+    client.get(sys.argv[2]).get_data()
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'modules': len(sys.modules)
+}))
+'''
+
+def measure_startup(mode, route, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT, mode, route], text=True)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {name: round(statistics.median(sample[name] for sample in samples), 2) for name in samples[0]}
+
+def memory_usage():
+    # Rss, Pss and private memory of this process in MB, Linux only
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                fields = line.split()
+                if len(fields) == 3 and fields[2] == 'kB':
+                    usage[fields[0].rstrip(':')] = int(fields[1]) / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_mb': round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)}
+    return {
+        'rss_mb': round(usage.get('Rss', 0), 1),
+        'pss_mb': round(usage.get('Pss', 0), 1),
+        'private_mb': round(usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0), 1)
+    }
+
+def serve_routes(flask_app, requests):
+    with flask_app.test_client() as client:
+        for _ in range(requests):
+            for route in ROUTES:
+                client.get(route).get_data()
+
+def measure_workers(workers, preload, requests):
+    # Fork workers like gunicorn does and collect their memory after serving a few requests
+    import config
+    config.WARM_UP = False
+    if preload:
+        import app as application
+        master_app = application.create_app()
+        application.warm_up(master_app)
+
+    children = []
+    for _ in range(workers):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            try:
+                if preload:
+                    flask_app = master_app
+                else:
+                    import app as application
+                    flask_app = application.create_app()
+                serve_routes(flask_app, requests)
+                os.write(write_end, json.dumps(memory_usage()).encode('utf-8'))
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        children.append((pid, read_end))
+
+    results = []
+    for pid, read_end in children:
+        with os.fdopen(read_end) as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+        if output:
+            results.append(json.loads(output))
+    return {name: round(statistics.mean(result[name] for result in results), 1) for name in results[0]}
+
+def measure_workers_in_subprocess(workers, preload, requests):
+    # Each variant forks from its own clean interpreter
+    output = subprocess.check_output([sys.executable, __file__, '--_workers', str(workers),
+                                      '--_preload', '1' if preload else '0', '--_requests', str(requests)], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Fyyur startup time and per-worker memory.')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per startup measurement.')
+    parser.add_argument('--workers', type=int, default=4, help='Forked workers per memory measurement.')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per route served by every worker.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--_workers', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--_preload', help=argparse.SUPPRESS)
+    parser.add_argument('--_requests', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._workers:
+        print(json.dumps(measure_workers(args._workers, args._preload == '1', args._requests)))
+        return
+
+    results = {'startup': {}, 'workers': {}}
+    for mode in ('cold', 'warm'):
+        for route in ('/', '/venues/create'):
+            name = '{0} {1}'.format(mode, route)
+            results['startup'][name] = measure_startup(mode, route, args.runs)
+            print('{0:<22} import {import_ms:>8.1f} ms  create_app {create_app_ms:>8.1f} ms  '
+                  'first request {first_request_ms:>8.1f} ms  {modules:>5.0f} modules'.format(name, **results['startup'][name]))
+
+    for preload in (False, True):
+        name = 'preload' if preload else 'no preload'
+        results['workers'][name] = measure_workers_in_subprocess(args.workers, preload, args.requests)
+        print('{0:<22} per worker: '.format(name) +
+              ', '.join('{0} {1:.1f}'.format(key, value) for key, value in results['workers'][name].items()))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
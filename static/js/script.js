@@ -2,3 +2,55 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// search-as-you-type for the navbar search fields, suggestions come from /autocomplete
+(function() {
+  var inputs = document.querySelectorAll('form.search input[name=search_term]');
+  Array.prototype.forEach.call(inputs, function(input) {
+    var list = document.createElement('ul');
+    var timer = null;
+    var latest = 0;
+    list.className = 'autocomplete';
+    list.style.display = 'none';
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.appendChild(list);
+
+    function render(hits) {
+      list.innerHTML = '';
+      hits.forEach(function(hit) {
+        var item = document.createElement('li');
+        var link = document.createElement('a');
+        link.href = hit.url;
+        link.textContent = hit.name + ' (' + hit.type + ')';
+        item.appendChild(link);
+        list.appendChild(item);
+      });
+      list.style.display = hits.length ? 'block' : 'none';
+    }
+
+    input.addEventListener('input', function() {
+      var query = input.value.trim();
+      var request = ++latest;
+      clearTimeout(timer);
+      if (!query) {
+        render([]);
+        return;
+      }
+      timer = setTimeout(function() {
+        fetch('/autocomplete?q=' + encodeURIComponent(query))
+          .then(function(response) { return response.json(); })
+          .then(function(result) {
+            // Ignore answers to queries the user has typed past
+            if (request === latest) {
+              render(result.data);
+            }
+          });
+      }, 80);
+    });
+
+    input.addEventListener('blur', function() {
+      // Let a click on a suggestion through before hiding the list
+      setTimeout(function() { list.style.display = 'none'; }, 200);
+    });
+  });
+})();
@@ -0,0 +1,88 @@
+## Shared fixtures. The tests run against a scratch Postgres database named by
+## TEST_DATABASE_URL, migrated to the latest revision once and emptied before
+## every test, and are skipped without it:
+##
+##   TEST_DATABASE_URL=postgresql://postgres@127.0.0.1:5432/fyyur_test python -m pytest
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import time
+
+import pytest
+
+import config
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+TABLES = ['shows', 'similar_artists', 'show_daily_rollups', 'show_monthly_rollups',
+          'show_counter_state', 'venues', 'artists']
+
+# Everything derived from the emptied tables
+TAGS = ['venues', 'artists', 'shows', 'names', 'matches', 'recommendations']
+
+@pytest.fixture(scope='session')
+def app():
+    database_url = os.environ.get('TEST_DATABASE_URL')
+    if not database_url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+
+    # Query budgets fail the request when TESTING is on (see instrumentation.py)
+    config.TESTING = True
+    config.SQLALCHEMY_DATABASE_URI = database_url
+    config.SQLALCHEMY_BINDS = {}
+    config.WTF_CSRF_ENABLED = False
+    config.WARM_UP = False
+    config.PAGE_CACHE_BACKEND = None
+
+    import app as application
+    from flask_migrate import upgrade
+    flask_app = application.create_app()
+    with flask_app.app_context():
+        upgrade(directory=os.path.join(flask_app.root_path, 'migrations'))
+    return flask_app
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    # Run in Europe/Berlin (UTC+2 in April), show times are stored in the
+    # server's local time and input with an offset is converted to it
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+@pytest.fixture
+def client(app):
+    import app as application
+    from models import db
+    with app.app_context():
+        db.session.execute('TRUNCATE {0} RESTART IDENTITY CASCADE'.format(', '.join(TABLES)))
+        db.session.commit()
+        db.session.remove()
+        application.page_cache.invalidate(*TAGS)
+    # The in-memory indexes load the emptied tables on their next lookup
+    for index in (application.name_index, application.match_index):
+        if index.refreshing is not None:
+            index.refreshing.join()
+        index.generation = None
+    return app.test_client()
+
+@pytest.fixture
+def listing(app, client):
+    # One venue in San Francisco and one Jazz / Blues artist, as (venue_id, artist_id)
+    from models import db, Artist, Venue
+    with app.app_context():
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+                      phone='123-123-1234', genres=['Jazz'], seeking_talent=True)
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', phone='326-123-5000',
+                        genres=['Jazz', 'Blues'], seeking_venue=True)
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        ids = venue.id, artist.id
+        db.session.remove()
+    return ids
@@ -0,0 +1,75 @@
+## The streamed API listings, the conditional GET validators and the name search
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from models import db, Artist, Venue
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+def add_listing(app):
+    # Five venues in three areas and five artists, more rows than one batch of 2
+    with app.app_context():
+        for index, (city, state) in enumerate([('Oakland', 'CA'), ('San Francisco', 'CA'), ('San Francisco', 'CA'),
+                                               ('New York', 'NY'), ('Oakland', 'CA')]):
+            db.session.add(Venue(name='Venue {0}'.format(index), city=city, state=state, genres=['Jazz']))
+            db.session.add(Artist(name='Artist {0}'.format(index), city=city, state=state, genres=['Jazz']))
+        db.session.commit()
+        db.session.remove()
+
+def test_venues_streamed_by_area(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 2)
+    add_listing(app)
+    response = client.get('/api/v1/venues')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [(area['city'], area['state'], [venue['name'] for venue in area['venues']])
+            for area in response.get_json()['data']] == [
+        ('Oakland', 'CA', ['Venue 0', 'Venue 4']),
+        ('San Francisco', 'CA', ['Venue 1', 'Venue 2']),
+        ('New York', 'NY', ['Venue 3'])
+    ]
+
+def test_artists_streamed(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 2)
+    add_listing(app)
+    response = client.get('/api/v1/artists')
+    assert response.is_streamed
+    assert [artist['name'] for artist in response.get_json()['data']] == ['Artist {0}'.format(index) for index in range(5)]
+
+def test_empty_listing(client):
+    assert client.get('/api/v1/venues').get_json() == {'data': []}
+    assert client.get('/api/v1/artists?genre=Jazz').get_json() == {'data': []}
+
+def test_not_modified(client, listing):
+    response = client.get('/api/v1/venues/{0}'.format(listing[0]))
+    assert response.headers.get('ETag')
+    response = client.get('/api/v1/venues/{0}'.format(listing[0]), headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers.get('ETag')
+
+@pytest.mark.parametrize('url, status', [('/api/v1/venues/999', 404), ('/api/v1/analytics/planet/earth', 404),
+                                         ('/api/v1/venues/availability?start=never', 400)])
+def test_errors_carry_no_validators(client, url, status):
+    response = client.get(url)
+    assert response.status_code == status
+    assert 'ETag' not in response.headers
+    assert 'Last-Modified' not in response.headers
+
+@pytest.mark.parametrize('term, names', [('_', []), ('%', ['50% Club']), ('0%', ['50% Club']),
+                                         ('\\', ['Back\\Slash']), ('b_ck', []), ('back', ['Back\\Slash'])])
+def test_search_wildcards_match_themselves(app, client, term, names):
+    with app.app_context():
+        for name in ('50% Club', 'Back\\Slash', 'The Musical Hop'):
+            db.session.add(Venue(name=name, city='Oakland', state='CA', genres=[]))
+        db.session.commit()
+        db.session.remove()
+    response = client.get('/api/v1/venues/search', query_string={'q': term})
+    assert sorted(venue['name'] for venue in response.get_json()['data']) == names
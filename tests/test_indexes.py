@@ -0,0 +1,67 @@
+## The in-memory name and match indexes reload off the request path
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import name_index, match_index
+from models import db, Venue
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def insert_venue_bypassing_session(app, name):
+    # A venue written by another process: no session events, no invalidation
+    with app.app_context():
+        db.session.execute("INSERT INTO venues (name, city, state, genres) VALUES (:name, 'Oakland', 'CA', '{Jazz}')",
+                           {'name': name})
+        db.session.commit()
+        db.session.remove()
+
+def autocomplete(client, query):
+    return [hit['name'] for hit in client.get('/autocomplete', query_string={'q': query}).get_json()['data']]
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+def test_stale_index_answers_while_reloading(app, client, listing):
+    assert autocomplete(client, 'gun') == ['Guns N Petals']
+    insert_venue_bypassing_session(app, 'Hopper Hall')
+    assert autocomplete(client, 'hopper') == []
+
+    # Past its maximum age the index answers from the current copy at once
+    # and reloads on a background thread
+    name_index.built_at -= name_index.max_age + 1
+    assert autocomplete(client, 'hopper') == []
+    if name_index.refreshing is not None:
+        name_index.refreshing.join()
+    assert autocomplete(client, 'hopper') == ['Hopper Hall']
+    assert name_index.is_current()
+
+def test_commit_during_reload_is_kept(app, client, listing, monkeypatch):
+    venue_id = listing[0]
+    with app.app_context():
+        assert match_index.profile('venue', venue_id).city == 'San Francisco'
+        db.session.remove()
+    load = match_index.load
+
+    def load_then_commit():
+        # The rows are read before this commit, which is applied meanwhile
+        loaded = load()
+        db.session.query(Venue).get(venue_id).city = 'Oakland'
+        db.session.commit()
+        return loaded
+
+    monkeypatch.setattr(match_index, 'load', load_then_commit)
+    with app.app_context():
+        match_index.reload()
+        db.session.remove()
+    assert match_index.profiles['venue'][venue_id].city == 'Oakland'
+    assert venue_id in match_index.cities['venue'][('oakland', 'CA')]
+    assert venue_id not in match_index.cities['venue'][('san francisco', 'CA')]
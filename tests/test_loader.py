@@ -0,0 +1,40 @@
+## Rows cleaned by the bulk loader are stored the same by the COPY and the INSERT path
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('dateutil')
+
+import loader
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+REFERENCES = {
+    'artist': loader.build_reference_map([(1, 'Guns N Petals')]),
+    'venue': loader.build_reference_map([(2, 'The Musical Hop')])
+}
+
+@pytest.mark.parametrize('start_time', ['2035-04-01T19:00Z', '2035-04-01T21:00+02:00', '2035-04-01 21:00'])
+def test_show_times_are_naive_local(berlin_time, start_time):
+    row = loader.clean_row('shows', {'artist_id': '1', 'venue_name': 'the musical hop',
+                                     'start_time': start_time, 'end_time': '2035-04-01T21:00Z'}, REFERENCES)
+    assert row == {'artist_id': 1, 'venue_id': 2, 'start_time': datetime(2035, 4, 1, 21),
+                   'end_time': datetime(2035, 4, 1, 23)}
+    assert loader.copy_value(row['start_time']) == '2035-04-01T21:00:00'
+
+def test_blank_text_is_null():
+    row = loader.clean_row('venues', {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+                                      'phone': '', 'website': '  ', 'genres': ''})
+    assert row['phone'] is None and row['website'] is None and row['address'] is None
+    assert row['genres'] == []
+
+def test_blank_required_column():
+    with pytest.raises(ValueError, match='missing city'):
+        loader.clean_row('artists', {'name': 'Guns N Petals', 'city': ' ', 'state': 'CA'})
@@ -0,0 +1,74 @@
+## Every route with a query budget stays within it. The app runs with TESTING
+## on, where a route exceeding its budget fails the request (see instrumentation.py).
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+import config
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+# endpoint: (method, path, form data), {venue} and {artist} are the listing ids
+ROUTES = {
+    'main.venues': ('GET', '/venues', None),
+    'main.artists': ('GET', '/artists', None),
+    'main.shows': ('GET', '/shows', None),
+    'main.search_venues': ('POST', '/venues/search', {'search_term': 'hop'}),
+    'main.search_artists': ('POST', '/artists/search', {'search_term': 'guns'}),
+    'main.show_venue': ('GET', '/venues/{venue}', None),
+    'main.show_artist': ('GET', '/artists/{artist}', None),
+    'main.venue_availability_search': ('GET', '/venues/availability?city=San+Francisco&start=2035-04-02+21:00', None),
+    'main.calendar': ('GET', '/calendar?date=2035-04-01', None),
+    'main.analytics': ('GET', '/analytics/venue/{venue}', None),
+    'main.autocomplete': ('GET', '/autocomplete?q=gun', None),
+    'main.artist_matches': ('GET', '/artists/{artist}/matches', None),
+    'main.venue_matches': ('GET', '/venues/{venue}/matches', None),
+    'api.api_venues': ('GET', '/api/v1/venues', None),
+    'api.api_artists': ('GET', '/api/v1/artists', None),
+    'api.api_shows': ('GET', '/api/v1/shows', None),
+    'api.api_search_venues': ('GET', '/api/v1/venues/search?q=hop', None),
+    'api.api_search_artists': ('GET', '/api/v1/artists/search?q=guns', None),
+    'api.api_venue': ('GET', '/api/v1/venues/{venue}', None),
+    'api.api_artist': ('GET', '/api/v1/artists/{artist}', None),
+    'api.api_venue_availability': ('GET', '/api/v1/venues/availability?city=San+Francisco&start=2035-04-02T21:00', None),
+    'api.api_calendar': ('GET', '/api/v1/calendar?date=2035-04-01', None),
+    'api.api_analytics': ('GET', '/api/v1/analytics/city/San Francisco, CA', None),
+    'api.api_artist_matches': ('GET', '/api/v1/artists/{artist}/matches', None),
+    'api.api_venue_matches': ('GET', '/api/v1/venues/{venue}/matches', None)
+}
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+def test_every_budget_has_a_route():
+    assert set(config.QUERY_BUDGETS) == set(ROUTES)
+
+@pytest.mark.parametrize('endpoint', sorted(ROUTES))
+def test_route_reaches_endpoint(app, endpoint):
+    method, path, data = ROUTES[endpoint]
+    path = path.format(venue=1, artist=1).split('?')[0]
+    assert app.url_map.bind('localhost').match(path, method=method)[0] == endpoint
+
+@pytest.mark.parametrize('endpoint', sorted(ROUTES))
+def test_route_within_budget(client, listing, endpoint):
+    venue_id, artist_id = listing
+    response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                                   'start_time': '2035-04-01 21:00'})
+    # The form answers with the home page and a flashed message, not a redirect
+    assert response.status_code == 200
+    assert b'Show was successfully listed!' in response.data
+
+    method, path, data = ROUTES[endpoint]
+    path = path.format(venue=venue_id, artist=artist_id)
+    response = client.open(path, method=method, data=data)
+    assert response.status_code == 200
+    # Read streamed bodies to the end, as a server would, which ends the request
+    response.get_data()
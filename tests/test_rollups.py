@@ -0,0 +1,97 @@
+## Analytics rollups stay consistent through show creation, edits and deletes
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def rollup_totals(app, dimension):
+    # {key: shows} of the monthly totals of a dimension, and the daily sum
+    with app.app_context():
+        monthly = dict(db.session.execute(
+            "SELECT key, sum(shows) FROM show_monthly_rollups WHERE dimension = :dimension AND genre = '' GROUP BY key",
+            {'dimension': dimension}).fetchall())
+        daily = dict(db.session.execute(
+            'SELECT key, sum(shows) FROM show_daily_rollups WHERE dimension = :dimension GROUP BY key',
+            {'dimension': dimension}).fetchall())
+        db.session.remove()
+    assert monthly == daily
+    return {key: shows for key, shows in monthly.items() if shows}
+
+def negative_rows(app):
+    with app.app_context():
+        count = db.session.execute(
+            'SELECT (SELECT count(*) FROM show_daily_rollups WHERE shows < 0) + '
+            '(SELECT count(*) FROM show_monthly_rollups WHERE shows < 0)').scalar()
+        db.session.remove()
+    return count
+
+def create_show(client, venue_id, artist_id, start_time):
+    response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+    # The form answers with the home page and a flashed message, not a redirect
+    assert response.status_code == 200
+    assert b'Show was successfully listed!' in response.data
+
+VENUE_FORM = {'name': 'The Musical Hop', 'address': '1015 Folsom Street', 'phone': '123-123-1234',
+              'image_link': '', 'genres': ['Jazz'], 'facebook_link': '', 'website_link': '',
+              'seeking_description': ''}
+
+ARTIST_FORM = {'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'phone': '326-123-5000',
+               'image_link': 'https://example.com/artist.jpg', 'facebook_link': 'https://www.facebook.com/GunsNPetals',
+               'website_link': 'https://www.gunsnpetalsband.com', 'seeking_description': ''}
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+def test_new_shows_are_counted(app, client, listing):
+    venue_id, artist_id = listing
+    create_show(client, venue_id, artist_id, '2035-04-01 21:00')
+    create_show(client, venue_id, artist_id, '2035-04-08 21:00')
+
+    assert rollup_totals(app, 'venue') == {str(venue_id): 2}
+    assert rollup_totals(app, 'city') == {'San Francisco, CA': 2}
+    assert rollup_totals(app, 'genre') == {'Jazz': 2, 'Blues': 2}
+
+def test_venue_city_edit_then_delete(app, client, listing):
+    venue_id, artist_id = listing
+    create_show(client, venue_id, artist_id, '2035-04-01 21:00')
+    create_show(client, venue_id, artist_id, '2035-05-01 21:00')
+
+    response = client.post('/venues/{0}/edit'.format(venue_id), data=dict(VENUE_FORM, city='Oakland', state='CA'))
+    assert response.status_code == 302
+    assert rollup_totals(app, 'city') == {'Oakland, CA': 2}
+
+    assert client.delete('/venues/{0}'.format(venue_id)).status_code == 200
+    assert rollup_totals(app, 'city') == {}
+    assert rollup_totals(app, 'venue') == {}
+    assert negative_rows(app) == 0
+
+def test_artist_genre_edit_then_delete(app, client, listing):
+    venue_id, artist_id = listing
+    create_show(client, venue_id, artist_id, '2035-04-01 21:00')
+
+    response = client.post('/artists/{0}/edit'.format(artist_id), data=dict(ARTIST_FORM, genres=['Rock n Roll']))
+    assert response.status_code == 302
+    assert rollup_totals(app, 'genre') == {'Rock n Roll': 1}
+
+    assert client.delete('/artists/{0}'.format(artist_id)).status_code == 200
+    assert rollup_totals(app, 'genre') == {}
+    assert rollup_totals(app, 'city') == {}
+    assert negative_rows(app) == 0
+
+def test_edit_without_key_change_keeps_counts(app, client, listing):
+    venue_id, artist_id = listing
+    create_show(client, venue_id, artist_id, '2035-04-01 21:00')
+
+    client.post('/venues/{0}/edit'.format(venue_id), data=dict(VENUE_FORM, city='San Francisco', state='CA', phone='555-0100'))
+    assert rollup_totals(app, 'city') == {'San Francisco, CA': 1}
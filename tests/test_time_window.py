@@ -0,0 +1,64 @@
+## Requested time windows are naive local times, offsets are converted to the server's time zone
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import parse_time_window
+
+#----------------------------------------------------------------------------#
+# Tests.
+#----------------------------------------------------------------------------#
+
+def test_utc_designator(berlin_time):
+    assert parse_time_window('2035-04-01T19:00Z', '2035-04-01T21:00Z') == \
+        (datetime(2035, 4, 1, 21, 0), datetime(2035, 4, 1, 23, 0))
+
+def test_offset(berlin_time):
+    assert parse_time_window('2035-04-01T23:00+04:00', '2035-04-02T01:30+04:00') == \
+        (datetime(2035, 4, 1, 21, 0), datetime(2035, 4, 1, 23, 30))
+
+def test_mixed_naive_and_offset(berlin_time):
+    assert parse_time_window('2035-04-01 21:00', '2035-04-01T20:00Z') == \
+        (datetime(2035, 4, 1, 21, 0), datetime(2035, 4, 1, 22, 0))
+
+def test_end_before_start(berlin_time):
+    with pytest.raises(ValueError):
+        parse_time_window('2035-04-01T21:00Z', '2035-04-01T21:00+02:00')
+
+@pytest.mark.parametrize('start, expected', [('2035-04-01T21:00Z', '2035-04-01T23:00:00'),
+                                             ('2035-04-01T21:00+02:00', '2035-04-01T21:00:00')])
+def test_availability_api_with_offset(berlin_time, client, listing, start, expected):
+    response = client.get('/api/v1/venues/availability', query_string={'start': start})
+    assert response.status_code == 200
+    assert response.get_json()['start'] == expected
+    assert [venue['id'] for venue in response.get_json()['data']] == [listing[0]]
+
+def test_show_created_with_offset(berlin_time, client, listing):
+    venue_id, artist_id = listing
+    response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                                   'start_time': '2035-04-01T19:00Z'})
+    # The form answers with the home page and a flashed message, not a redirect
+    assert response.status_code == 200
+    assert b'Show was successfully listed!' in response.data
+    shows = client.get('/api/v1/venues/{0}'.format(venue_id)).get_json()['upcoming_shows']
+    assert [show['start_time'] for show in shows] == ['2035-04-01T21:00:00']
+
+def test_show_in_an_hour_with_offset_is_upcoming(berlin_time, client, listing):
+    # A show starting in an hour, given in UTC, is upcoming for the local
+    # clock the listings and the counters compare against (stored as UTC it
+    # would lie an hour in the past)
+    venue_id, artist_id = listing
+    starts = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%MZ')
+    response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                                   'start_time': starts})
+    assert b'Show was successfully listed!' in response.data
+    venue = client.get('/api/v1/venues/{0}'.format(venue_id)).get_json()
+    assert (venue['upcoming_shows_count'], venue['past_shows_count']) == (1, 0)
+    assert len(venue['upcoming_shows']) == 1
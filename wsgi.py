@@ -0,0 +1,16 @@
+## WSGI entry point
+##
+## Builds the app once at import. With --preload gunicorn imports this module
+## in the master process, create_app() warms it up (WARM_UP) and every forked
+## worker shares the loaded modules, compiled templates and data copy on write:
+##
+##   flask templates compile
+##   gunicorn --preload --workers 4 wsgi:app
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app()